@@ -1,37 +1,46 @@
-import requests
-import pandas as pd
-import time
+import collections
 import os
-from openpyxl import load_workbook
-
-# File paths
-input_file = "D:/Python/Streamlit/Framework/InputPhoneNumber.xlsx"
-output_file = "output.xlsx"
+import metrics
+from key_pool import load_key_pool
+from result_store import ResultWriter, export_outputs, open_result_store
+from lookup_cache import LookupCache
+from phone_api import API_BASE_URL, API_ERROR, UNFINISHED_STATUSES, PhoneApiClient
+from prevalidation import prevalidate_numbers, rejection_summary
+from input_reader import PhoneNumberReader
+
+# File paths (PHONE_VALIDATOR_INPUT / PHONE_VALIDATOR_OUTPUT override them)
+input_file = os.environ.get("PHONE_VALIDATOR_INPUT", "D:/Python/Streamlit/Framework/InputPhoneNumber.xlsx")
+output_file = os.environ.get("PHONE_VALIDATOR_OUTPUT", "output.xlsx")
 
 # Check if input file exists
 if not os.path.exists(input_file):
     print(f"❌ Error: Input file '{input_file}' not found!")
     exit()
 
-# Read Excel file as text (to prevent formatting issues)
+# Open the Excel file as a stream of text cells (to prevent formatting issues)
 try:
-    df = pd.read_excel(input_file, dtype=str, sheet_name="Sheet2")
-    df.columns = df.columns.str.strip()  # Remove extra spaces
+    reader = PhoneNumberReader(input_file, sheet_name="Sheet2")
+except ValueError as e:
+    # "Phone_Number" column is missing
+    print(f"❌ Error: {e}")
+    exit()
 except Exception as e:
     print(f"❌ Error loading Excel file: {e}")
     exit()
 
-# Ensure "Phone_Number" column exists
-if "Phone_Number" not in df.columns:
-    print(f"❌ Error: 'Phone_Number' column is missing! Available columns: {df.columns}")
-    exit()
-
 print("🚀 Starting phone number validation process...")
 
 # API details
-api_base_url = "http://phone-number-api.com/csv/"
 fields = "status,message,numberType,numberValid,numberValidForRegion,isDisposible,numberCountryCode,numberAreaCode,formatE164,formatInternational,carrier,continent,countryName,country,region,regionName,city,zip,query"
 
+# Rate budget (5 requests per minute; PHONE_API_REQUESTS_PER_WINDOW etc. override it)
+requests_per_window = int(os.environ.get("PHONE_API_REQUESTS_PER_WINDOW", 5))
+window_seconds = float(os.environ.get("PHONE_API_WINDOW_SECONDS", 60))
+# One budget (and circuit breaker) per key listed in PHONE_API_KEYS / PHONE_API_POOL; default: the free endpoint
+key_pool = load_key_pool(API_BASE_URL, requests_per_window, window_seconds, burst=1)
+max_in_flight = int(os.environ.get("PHONE_API_MAX_IN_FLIGHT", 1))  # Raise on paid plans to keep several requests in flight
+lookup_mode = os.environ.get("PHONE_LOOKUP_MODE", "live")  # "live", "hybrid" (numbering-plan fields offline) or "offline" (no API calls)
+
 # Expected Response Headers
 expected_headers = [
     "Status", "Message", "Number Type", "Number Valid","numberValidForRegion", "Is Disposable",
@@ -40,73 +49,80 @@ expected_headers = [
     "Region Name", "City", "ZIP", "Query"
 ]
 
-# Function to append data incrementally
-def append_to_excel(data, file_path, sheet_name="Sheet1"):
-    if os.path.exists(file_path):
-        with pd.ExcelWriter(file_path, mode="a", engine="openpyxl", if_sheet_exists="overlay") as writer:
-            workbook = load_workbook(file_path)
-            sheet = writer.sheets[sheet_name]
-            start_row = sheet.max_row  # Find next empty row
-            data.to_excel(writer, index=False, header=False, startrow=start_row)
-    else:
-        data.to_excel(file_path, index=False)  # If file doesn't exist, create new
-
-# Results List
-results = []
-batch_size = 5  # Save after every 5 requests
-
-# Loop through each phone number
-for index, phone_number in enumerate(df["Phone_Number"], start=1):
-    if pd.isna(phone_number) or phone_number.strip() == "":
-        print("⚠️ Skipping empty phone number.")
-        continue
-
-    phone_number = phone_number.strip()
-
-    # Ensure the phone number starts with "+"
-    if not phone_number.startswith("+"):
-        print(f"⚠️ Warning: '{phone_number}' is missing '+'. Skipping...")
-        continue
-
-    # Construct API Request URL
-    url = f"{api_base_url}?number={phone_number}&fields={fields}"
-    print(f"📡 Sending request {index}: {phone_number} → {url}")
-
-    try:
-        response = requests.get(url, timeout=10)
-
-        if response.status_code == 200:
-            values = response.text.strip().split(",")
-
-            # Handle Column Mismatches
-            if len(values) < len(expected_headers):
-                values += ["N/A"] * (len(expected_headers) - len(values))
-            elif len(values) > len(expected_headers):
-                print(f"⚠️ Extra fields in API response for {phone_number}. Adjusting...")
-                expected_headers = expected_headers[:len(values)]
-
-            # Store Result
-            results.append(values)
-        else:
-            print(f"❌ API Error {response.status_code} for {phone_number}: {response.text}")
-
-        # ⏳ Maintain 5 Requests per Minute (12-sec delay)
-        time.sleep(12)
-
-        # Save every `batch_size` requests
-        if index % batch_size == 0 and results:
-            print(f"💾 Saving {len(results)} new results to '{output_file}'...")
-            new_data = pd.DataFrame(results, columns=expected_headers)
-            append_to_excel(new_data, output_file)
-            results = []  # Clear results list
-
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Request failed for {phone_number}: {e}")
-
-# Final Save if any remaining results
-if results:
-    print(f"💾 Final saving {len(results)} remaining results...")
-    new_data = pd.DataFrame(results, columns=expected_headers)
-    append_to_excel(new_data, output_file)
+# Append-only result store (output.db next to the workbook)
+store = open_result_store(output_file, expected_headers)
+
+# Cross-run lookup cache
+lookup_cache = LookupCache()
+
+# API client (pooled connections, shared rate budget, cache-first)
+api_client = PhoneApiClient(fields, expected_headers, key_pool, lookup_cache,
+                            max_in_flight=max_in_flight, mode=lookup_mode)
+
+# Stage timings (PHONE_METRICS_PORT / PHONE_METRICS_FILE expose them to Prometheus)
+metrics_file = metrics.start_from_env()
+
+# Per-row log, off unless PHONE_ROW_LOG names a JSON-lines file
+row_log = metrics.open_row_log()
+
+# Results are saved in batches on a writer thread while lookups continue
+writer = ResultWriter(store)
+
+
+# Rows dropped by pre-validation, per reason
+dropped = collections.Counter()
+
+
+# Numbers to send to the API (read lazily by the API client)
+def pending_numbers():
+    for chunk in reader.chunks():
+        # Normalize and pre-validate a whole chunk before any API call
+        checked = prevalidate_numbers(chunk)
+        dropped.update(rejection_summary(checked).to_dict())
+
+        plausible = checked.loc[checked["Reject Reason"].isna(), "Normalized"]
+        for index, phone_number in plausible.items():
+            row_log.log("queued", row=index + 1, number=phone_number)
+            yield phone_number
+
+
+# Loop through the results (they arrive in input order)
+try:
+    for phone_number, values in api_client.lookup_many(pending_numbers()):
+        # Failed lookups are reported by the client and not stored
+        row_log.log("result", number=phone_number, status=values[0])
+        if values[0] == API_ERROR or values[0] in UNFINISHED_STATUSES:
+            continue
+
+        # Store Result
+        writer.put(values)
+except KeyboardInterrupt:
+    print("✋ Interrupted, saving the results so far...")
+finally:
+    # Drain the writer so every result received so far ends up in the store
+    writer.close()
+    reader.close()
+print(f"💾 Saved {writer.written} new results to '{store.path}'")
+
+print(f"🧹 Pre-validation dropped {sum(dropped.values())} rows")
+for reason, count in dropped.most_common():
+    print(f"   • {reason}: {count}")
+
+# Export the full result set once (typed; plus a .parquet copy when pyarrow is installed)
+print(f"📤 Exporting {store.count()} results to '{output_file}'...")
+for path in export_outputs(store, output_file):
+    print(f"   • {path}")
+store.close()
+store.index.close()
+
+print(f"📡 API calls made: {api_client.api_calls}")
+print(key_pool.summary())
+print(lookup_cache.summary())
+print(metrics.REGISTRY.summary())
+if metrics_file:
+    metrics.REGISTRY.write_file(metrics_file)
+row_log.close()
+api_client.close()
+lookup_cache.close()
 
 print("\n✅ Process complete! Data saved incrementally.")
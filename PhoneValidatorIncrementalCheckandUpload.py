@@ -1,146 +1,134 @@
-import requests
-import pandas as pd
-import time
+import collections
 import os
-from openpyxl import load_workbook
-
-# 📂 File Paths
-input_file = "D:/Python/Streamlit/Framework/PhoneValidator/InputPhoneNumber.xlsx"
-output_file = "D:/Python/Streamlit/Framework/PhoneValidator/output_Incremental.xlsx"
+import metrics
+from key_pool import load_key_pool
+from result_store import ResultWriter, export_outputs, open_result_store
+from lookup_cache import LookupCache
+from phone_api import API_BASE_URL, UNFINISHED_STATUSES, PhoneApiClient
+from prevalidation import prevalidate_numbers, rejection_summary
+from input_reader import PhoneNumberReader
+from result_schema import EXPECTED_HEADERS, FIELDS
+from work_queue import open_processed_view
+
+# 📂 File Paths (PHONE_VALIDATOR_INPUT / PHONE_VALIDATOR_OUTPUT override them, e.g. for benchmark.py)
+input_file = os.environ.get("PHONE_VALIDATOR_INPUT", "D:/Python/Streamlit/Framework/PhoneValidator/InputPhoneNumber.xlsx")
+output_file = os.environ.get("PHONE_VALIDATOR_OUTPUT", "D:/Python/Streamlit/Framework/PhoneValidator/output_Incremental.xlsx")
 
 # 🛑 Check if input file exists
 if not os.path.exists(input_file):
     print(f"❌ Error: Input file '{input_file}' not found!")
     exit()
 
-# 📥 Read Input File
+# 📥 Open Input File (streamed in chunks, never loaded whole)
 try:
-    df = pd.read_excel(input_file, dtype=str, sheet_name="Sheet2")
-    df.columns = df.columns.str.strip()  # Remove extra spaces in column names
+    reader = PhoneNumberReader(input_file, sheet_name="Sheet2")
+except ValueError as e:
+    # "Phone_Number" column is missing
+    print(f"❌ Error: {e}")
+    exit()
 except Exception as e:
     print(f"❌ Error loading Excel file: {e}")
     exit()
 
-# Ensure "Phone_Number" column exists
-if "Phone_Number" not in df.columns:
-    print(f"❌ Error: 'Phone_Number' column is missing! Available columns: {df.columns}")
-    exit()
-
 print("🚀 Starting phone number validation process...")
 
-# 📝 Load Already Processed Phone Numbers
-processed_numbers = set()
-if os.path.exists(output_file):
-    try:
-        df_output = pd.read_excel(output_file, dtype=str)
-        if df_output.empty:
-            print(f"⚠️ Warning: '{output_file}' exists but is empty.")
-        else:
-            print(f"✅ Output File Loaded Successfully!")
-
-        # Normalize stored numbers by removing spaces and dashes
-        if "Query" in df_output.columns:
-            processed_numbers = set(df_output["Query"].dropna().str.strip().str.replace(" ", "").str.replace("-", ""))
-            print(f"🔍 Found {len(processed_numbers)} previously processed phone numbers. Skipping them...")
-        else:
-            print(f"❌ Error: 'Query' column not found in '{output_file}'. Available columns: {df_output.columns}")
-
-    except Exception as e:
-        print(f"⚠️ Warning: Could not read '{output_file}': {e}")
+# ⏳ Rate Budget (free plan: 5 requests per minute; PHONE_API_REQUESTS_PER_WINDOW etc. override it)
+requests_per_window = int(os.environ.get("PHONE_API_REQUESTS_PER_WINDOW", 5))
+window_seconds = float(os.environ.get("PHONE_API_WINDOW_SECONDS", 60))
+# 🔑 One budget (and circuit breaker) per key listed in PHONE_API_KEYS / PHONE_API_POOL; default: the free endpoint
+key_pool = load_key_pool(API_BASE_URL, requests_per_window, window_seconds, burst=1)
+max_in_flight = int(os.environ.get("PHONE_API_MAX_IN_FLIGHT", 1))  # Raise on paid plans to keep several requests in flight
+lookup_mode = os.environ.get("PHONE_LOOKUP_MODE", "live")  # "live", "hybrid" (numbering-plan fields offline) or "offline" (no API calls)
+
+# 📦 Append-only result store (output_Incremental.db next to the workbook)
+store = open_result_store(output_file, EXPECTED_HEADERS)
+
+# 📝 Already Processed Phone Numbers (on-disk index, kept current by store.append)
+processed_numbers = store.index
+if processed_numbers:
+    print(f"🔍 Found {len(processed_numbers)} previously processed phone numbers. Skipping them...")
 else:
-    print(f"⚠️ Warning: Output file '{output_file}' does not exist yet.")
-
-# 🌐 API Details
-api_base_url = "http://phone-number-api.com/csv/"
-fields = "status,numberType,numberValid,numberValidForRegion,isDisposible,numberCountryCode,numberAreaCode,formatE164,formatNational,formatInternational,carrier,continent,continentCode,countryName,country,region,regionName,city,zip,offset,currency,query"
-
-# Expected API Response Headers
-expected_headers = [
-    "Status",  "Number Type", "Number Valid", "numberValidForRegion", "Is Disposable",
-    "Country Code", "Area Code", "E164 Format", "National Format", "International Format",
-    "Carrier", "Continent", "Continent Code", "Country Name", "Country", "Region",
-    "Region Name", "City", "ZIP", "Offset", "Currency", "Query"
-]
-
-# 📌 Function to append data to Excel
-def append_to_excel(data, file_path, sheet_name="Sheet1"):
-    if os.path.exists(file_path):
-        with pd.ExcelWriter(file_path, mode="a", engine="openpyxl", if_sheet_exists="overlay") as writer:
-            workbook = load_workbook(file_path)
-            sheet = writer.sheets.get(sheet_name, writer.book.active)
-            start_row = sheet.max_row  # Find next empty row
-            data.to_excel(writer, index=False, header=False, startrow=start_row)
-    else:
-        data.to_excel(file_path, index=False)  # Create new file if it doesn't exist
-
-# 🏁 Results Storage
-results = []
-batch_size = 5  # Save after every 5 requests
-
-# 🔄 Processing Phone Numbers
-for index, phone_number in enumerate(df["Phone_Number"], start=1):
-    if pd.isna(phone_number) or phone_number.strip() == "":
-        print("⚠️ Skipping empty phone number.")
-        continue
-
-    phone_number = phone_number.strip().replace(" ", "").replace("-", "")  # Normalize format
-
-    # Check if already processed
-    if phone_number in processed_numbers:
-        print(f"✅ Skipping already processed: {phone_number}")
-        continue
-
-    # Ensure phone number starts with "+"
-    if not phone_number.startswith("+"):
-        print(f"⚠️ Warning: '{phone_number}' is missing '+'. Skipping...")
-        continue
-
-    # 📡 Construct API Request
-    url = f"{api_base_url}?number={phone_number}&fields={fields}"
-    print(f"📡 Sending request {index}: {phone_number}")
-
-    try:
-        response = requests.get(url, timeout=10)
-
-        if response.status_code == 200:
-            values = response.text.strip().split(",")
-
-            # Ensure the response has exactly 23 fields (fill missing with "N/A")
-            while len(values) < len(expected_headers):
-                values.append("N/A")
-
-            if len(values) > len(expected_headers):
-                values = values[:len(expected_headers)]  # Trim extra fields
-
-        else:
-            print(f"❌ API Error: {response.status_code} for {phone_number}")
-            values = ["API_ERROR"] + ["N/A"] * (len(expected_headers) - 2) + [phone_number]  # Fill error & copy phone number
-
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Request failed for {phone_number}: {e}")
-        values = ["REQUEST_FAILED"] + ["N/A"] * (len(expected_headers) - 2) + [phone_number]  # Copy phone number
-
-    # ✅ Ensure "Query" column is always filled with the original phone number
-    if values[-1] == "N/A":
-        values[-1] = phone_number
-
-    # ✅ Store processed number
-    results.append(values)
-
-    # ⏳ Rate Limit (5 Requests per Minute → 12-sec delay)
-    time.sleep(12)
-
-    # 💾 Save every `batch_size` requests
-    if index % batch_size == 0 and results:
-        print(f"💾 Saving {len(results)} new results to '{output_file}'...")
-        new_data = pd.DataFrame(results, columns=expected_headers)
-        append_to_excel(new_data, output_file)
-        results = []  # Clear results list
-
-# 🏁 Final Save for remaining results
-if results:
-    print(f"💾 Final saving {len(results)} remaining results...")
-    new_data = pd.DataFrame(results, columns=expected_headers)
-    append_to_excel(new_data, output_file)
+    print(f"⚠️ Warning: No previously processed numbers found in '{store.path}'.")
+
+# 📋 Numbers a work queue's workers already finished (PHONE_WORK_QUEUE) are skipped too
+resume_view = open_processed_view(processed_numbers)
+
+# ♻️ Cross-run lookup cache
+lookup_cache = LookupCache()
+
+# 📡 API client (pooled connections, shared rate budget, cache-first)
+api_client = PhoneApiClient(FIELDS, EXPECTED_HEADERS, key_pool, lookup_cache,
+                            max_in_flight=max_in_flight, mode=lookup_mode)
+
+# 📊 Stage timings (PHONE_METRICS_PORT / PHONE_METRICS_FILE expose them to Prometheus)
+metrics_file = metrics.start_from_env()
+
+# 📝 Per-row log, off unless PHONE_ROW_LOG names a JSON-lines file
+row_log = metrics.open_row_log()
+
+# 💾 Results are saved in batches on a writer thread while lookups continue
+writer = ResultWriter(store)
+
+
+# 🧹 Rows dropped by pre-validation, per reason
+dropped = collections.Counter()
+
+
+# 🔎 Numbers that still need a lookup (read lazily by the API client)
+def pending_numbers():
+    for chunk in reader.chunks():
+        # Normalize and pre-validate a whole chunk before any API call
+        checked = prevalidate_numbers(chunk)
+        dropped.update(rejection_summary(checked).to_dict())
+
+        plausible = checked.loc[checked["Reject Reason"].isna(), "Normalized"]
+        already_processed = resume_view.contains_many(plausible)
+        for (index, phone_number), seen in zip(plausible.items(), already_processed):
+            # Check if already processed
+            if seen:
+                row_log.log("skipped", row=index + 1, number=phone_number)
+                continue
+
+            row_log.log("queued", row=index + 1, number=phone_number)
+            yield phone_number
+
+
+# 🔄 Processing Phone Numbers (results arrive in input order)
+try:
+    for phone_number, values in api_client.lookup_many(pending_numbers()):
+        # ✅ Store processed number (lookups that ran out of retries stay unprocessed for the next run)
+        row_log.log("result", number=phone_number, status=values[0])
+        if values[0] in UNFINISHED_STATUSES:
+            continue
+        writer.put(values)
+except KeyboardInterrupt:
+    print("✋ Interrupted, saving the results so far...")
+finally:
+    # 🏁 Drain the writer: every result received so far ends up in the store
+    writer.close()
+    reader.close()
+print(f"💾 Saved {writer.written} new results to '{store.path}'")
+
+print(f"🧹 Pre-validation dropped {sum(dropped.values())} rows")
+for reason, count in dropped.most_common():
+    print(f"   • {reason}: {count}")
+
+# 📤 Export the full result set once (typed; plus a .parquet copy when pyarrow is installed)
+print(f"📤 Exporting {store.count()} results to '{output_file}'...")
+for path in export_outputs(store, output_file):
+    print(f"   • {path}")
+store.close()
+processed_numbers.close()
+resume_view.close()
+
+print(f"📡 API calls made: {api_client.api_calls}")
+print(key_pool.summary())
+print(lookup_cache.summary())
+print(metrics.REGISTRY.summary())
+if metrics_file:
+    metrics.REGISTRY.write_file(metrics_file)
+row_log.close()
+api_client.close()
+lookup_cache.close()
 
 print("\n✅ Process complete! Data saved incrementally.")
@@ -1,111 +1,340 @@
 import streamlit as st
 import pandas as pd
-import time
-import requests
+import collections
+import hashlib
 import io
 import os
-from openpyxl import load_workbook
+import time
+import uuid
+import metrics
+from key_pool import load_key_pool
+from result_store import EXCEL_MAX_ROWS, PARQUET_AVAILABLE, ResultStore, ResultWriter, export_outputs, index_prefix_for, cached_export, cached_export_path, open_result_store, store_path_for, sync_processed_index
+from processed_index import ProcessedIndex
+from lookup_cache import LookupCache
+from phone_api import API_BASE_URL, LOOKUP_MODES, UNFINISHED_STATUSES, PhoneApiClient, error_row
+from prevalidation import INVALID_FORMAT, REJECT_EMPTY, prevalidate_numbers, rejection_summary
+from input_reader import PhoneNumberReader
+from job_runner import ACTIVE_STATES, JOB_FAILED, JobManager
+from results_explorer import CHOICE_FILTERS, FLAG_FILTERS, PAGE_SIZE, ResultsExplorer
+from result_schema import EXPECTED_HEADERS, FIELDS
+from work_queue import open_processed_view
 
-# 🌐 API Details
-API_BASE_URL = "http://phone-number-api.com/csv/"
-FIELDS = "status,numberType,numberValid,numberValidForRegion,isDisposible,numberCountryCode,numberAreaCode,formatE164,formatNational,formatInternational,carrier,continent,continentCode,countryName,country,region,regionName,city,zip,offset,currency,query"
+OUTPUT_FILE = "validated_numbers.xlsx"
+EXPORT_NAME = os.path.splitext(os.path.basename(OUTPUT_FILE))[0]
 
-# Expected API Response Headers
-EXPECTED_HEADERS = [
-    "Status", "Number Type", "Number Valid", "numberValidForRegion", "Is Disposable",
-    "Country Code", "Area Code", "E164 Format", "National Format", "International Format",
-    "Carrier", "Continent", "Continent Code", "Country Name", "Country", "Region",
-    "Region Name", "City", "ZIP", "Offset", "Currency", "Query"
-]
+# ⏳ Rate Budget per key (free plan: 5 requests per minute; more keys via PHONE_API_KEYS / PHONE_API_POOL)
+# Single-number checks jump ahead of jobs; PHONE_BULK_QUOTA_SHARE below 1 keeps part of the budget free for them
+REQUESTS_PER_WINDOW = 5
+WINDOW_SECONDS = 60
+BURST_SIZE = 1
+MAX_IN_FLIGHT = 1  # Raise on paid plans to keep several requests in flight
+
+JOBS_DIR = "jobs"  # Uploads are copied here so background jobs outlive the session
+# Downloads, written from the store once per result-set version into the app's static folder
+# and served by Streamlit from disk (server.enableStaticServing in .streamlit/config.toml)
+EXPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "exports")
+EXPORTS_URL = "app/static/exports/"
+STATIC_FILE_LIMIT = 200 * 1024 * 1024  # Streamlit answers 404 for larger static files
+JOB_WORKERS = 1    # Jobs share one rate budget, so they run one after another
+# Overlapping uploads never pay twice for a number: finished lookups come from the cache, and
+# lookups still in flight are shared between sessions (coalescing.SHARED_INFLIGHT), even with more workers
+POLL_SECONDS = 2
+
+
+# 🏭 One job queue and one rate budget per server process, shared by every session
+@st.cache_resource
+def get_job_manager():
+    return JobManager(workers=JOB_WORKERS)
+
+
+# 📊 Prometheus endpoint/file for this server process (opt-in via PHONE_METRICS_PORT / PHONE_METRICS_FILE)
+@st.cache_resource
+def start_metrics():
+    return metrics.start_from_env()
+
+
+# 🔑 API keys with their budgets and circuit breakers, shared by every job on this server
+@st.cache_resource
+def get_key_pool():
+    return load_key_pool(API_BASE_URL, REQUESTS_PER_WINDOW, WINDOW_SECONDS, BURST_SIZE)
+
+
+# 🗂️ On-disk processed-number index, opened once and caught up incrementally from the result store
+@st.cache_resource
+def get_processed_index():
+    return ProcessedIndex(index_prefix_for(store_path_for(OUTPUT_FILE)))
+
+
+# 🔍 Server-side view of the result store: filtered pages and saved aggregates, never the whole table
+@st.cache_resource
+def get_results_explorer():
+    ResultStore(store_path_for(OUTPUT_FILE), EXPECTED_HEADERS).close()  # Brings an older store's schema and indexes up to date
+    return ResultsExplorer(store_path_for(OUTPUT_FILE), EXPECTED_HEADERS)
 
-OUTPUT_FILE = "validated_numbers.xlsx"
 
-# 📌 Function to append data to Excel
-def append_to_excel(data, file_path, sheet_name="Sheet1"):
-    if os.path.exists(file_path):
-        with pd.ExcelWriter(file_path, mode="a", engine="openpyxl", if_sheet_exists="overlay") as writer:
-            workbook = load_workbook(file_path)
-            sheet = writer.sheets.get(sheet_name, writer.book.active)
-            start_row = sheet.max_row  # Find next empty row
-            data.to_excel(writer, index=False, header=False, startrow=start_row)
+# 🔢 Matching row count per store version and filter set (counts over flag filters scan the table)
+@st.cache_data(max_entries=100)
+def count_results(version, filter_items):
+    return get_results_explorer().count(dict(filter_items))
+
+
+# 📥 Download file, produced only when its prepare button is clicked
+# The file is streamed from the store into EXPORTS_DIR and reused until results change.
+def export_download(extension):
+    store = ResultStore(store_path_for(OUTPUT_FILE), EXPECTED_HEADERS)
+    try:
+        return cached_export(store, EXPORTS_DIR, extension, name=EXPORT_NAME)
+    finally:
+        store.close()
+
+
+# 🔗 Link to an export in EXPORTS_DIR; the browser fetches it from Streamlit's static file server
+def export_link(path, extension):
+    if os.path.getsize(path) > STATIC_FILE_LIMIT:
+        st.caption(f"⚠️ The {extension} export is too large to download here, it is saved on the server "
+                   f"as '{path}'. Try a smaller format.")
     else:
-        data.to_excel(file_path, index=False)  # Create new file if it doesn't exist
+        st.link_button(f"📥 Download ({extension})", EXPORTS_URL + os.path.basename(path))
+
+
+# 🔍 Parse an upload once per distinct file content (keyed by SHA-256, the bytes are not re-hashed)
+@st.cache_data(show_spinner="Reading upload...")
+def inspect_upload(content_hash, file_name, _data):
+    buffer = io.BytesIO(_data)
+    buffer.name = file_name
+    try:
+        reader = PhoneNumberReader(buffer)
+    except ValueError:
+        return None
+    rows, plausible, dropped = 0, 0, collections.Counter()
+    for chunk in reader.chunks():
+        checked = prevalidate_numbers(chunk)
+        rows += len(checked)
+        plausible += int(checked["Reject Reason"].isna().sum())
+        dropped.update(rejection_summary(checked).to_dict())
+    reader.close()
+    return {"rows": rows, "plausible": plausible, "dropped": dict(dropped)}
+
+
+# 🔄 Validation job, runs on a JobManager worker thread
+def validate_file(job, input_path, lookup_mode):
+    reader = store = resume_view = lookup_cache = writer = api_client = row_log = None
+    progress = {"row": 0}
+    dropped = collections.Counter()
+    
+    # Numbers that need a lookup, pre-validated one chunk at a time
+    def pending_numbers():
+        for chunk in reader.chunks():
+            checked = prevalidate_numbers(chunk)
+            dropped.update(rejection_summary(checked).to_dict())
+            
+            # Malformed (non-empty) numbers are recorded in one go instead of taking a slot in the loop
+            invalid = checked[checked["Reject Reason"].notna() & ~checked["Reject Reason"].isin([REJECT_EMPTY])]
+            invalid = invalid[~invalid["Normalized"].isin(store.rows_for(invalid["Normalized"]).index)]  # Not indexed
+            if not invalid.empty:
+                store.append(error_row(INVALID_FORMAT, number, EXPECTED_HEADERS) for number in invalid["Normalized"])
+            
+            plausible = checked.loc[checked["Reject Reason"].isna(), "Normalized"]
+            plausible = plausible[~resume_view.contains_many(plausible)]
+            for index, phone_number in plausible.items():
+                if job.cancelled:
+                    return
+                progress["row"] = index + 1
+                yield phone_number
+    
+    try:
+        reader = PhoneNumberReader(input_path)
+        job.update(total=reader.total_rows, message="Starting validation...")
+        
+        # 📝 Load Already Processed Phone Numbers
+        processed_numbers = get_processed_index()
+        store = open_result_store(OUTPUT_FILE, EXPECTED_HEADERS, processed_numbers)
+        resume_view = open_processed_view(processed_numbers)  # Plus a work queue's done numbers (PHONE_WORK_QUEUE)
+        
+        lookup_cache = LookupCache()
+        writer = ResultWriter(store)  # Saves in batches on its own thread, lookups never wait on disk
+        api_client = PhoneApiClient(FIELDS, EXPECTED_HEADERS, get_key_pool(), lookup_cache,
+                                    max_in_flight=MAX_IN_FLIGHT, mode=lookup_mode)
+        row_log = metrics.open_row_log()
+        
+        for phone_number, values in api_client.lookup_many(pending_numbers(), should_stop=lambda: job.cancelled):
+            row_log.log("result", job=job.id, row=progress["row"], number=phone_number, status=values[0])
+            job.update(processed=progress["row"], message=f"📡 {phone_number}: {values[0]}")
+            if values[0] in UNFINISHED_STATUSES:
+                continue  # Out of retries or unreadable: left unprocessed so the next run tries again
+            writer.put(values)
+        
+        writer.close()  # Drain before exporting
+        outputs = export_outputs(store, OUTPUT_FILE)
+        get_results_explorer().summaries(max_age=0)  # Aggregates ready before anyone opens the explorer
+    finally:
+        # Whatever got opened is closed, and the job's copy of the upload goes even if opening failed
+        for resource in (writer, reader):
+            if resource is not None:
+                resource.close()
+        os.remove(input_path)
+        for resource in (store, api_client, lookup_cache, row_log, resume_view):
+            if resource is not None:
+                resource.close()
+    
+    job.update(message="✋ Cancelled, results so far are saved." if job.cancelled
+               else "✅ Processing complete! Data saved incrementally.")
+    return {"dropped": dict(dropped), "cache": lookup_cache.summary(), "outputs": outputs}
+
 
 # Streamlit UI
 st.title("📞 Phone Number Validator")
 
-uploaded_file = st.file_uploader("Upload an Excel file with phone numbers", type=["xlsx"])
+job_manager = get_job_manager()
+start_metrics()
+
+uploaded_file = st.file_uploader("Upload an Excel or CSV file with phone numbers", type=["xlsx", "csv"])
+lookup_mode = st.selectbox(
+    "Lookup mode", LOOKUP_MODES,
+    help="live: every field from the API · hybrid: country/format/type offline, carrier and disposable live · offline: no API calls",
+)
+
+# 🔎 Single number: answered from the cache, or with the next free request slot ahead of any running job
+with st.expander("🔎 Check a single number"):
+    single_number = st.text_input("Phone number", placeholder="+14155550100")
+    if st.button("🔎 Look up") and single_number.strip():
+        checked = prevalidate_numbers([single_number])
+        reason = checked["Reject Reason"].iloc[0]
+        if not pd.isna(reason):
+            st.error(f"❌ Not looked up: {reason}")
+        else:
+            lookup_cache = LookupCache()
+            api_client = PhoneApiClient(FIELDS, EXPECTED_HEADERS, get_key_pool(), lookup_cache, mode=lookup_mode)
+            try:
+                values = api_client.lookup_now(checked["Normalized"].iloc[0])
+            finally:
+                api_client.close()
+                lookup_cache.close()
+            if values[0] in UNFINISHED_STATUSES:
+                st.warning("⚠️ No usable answer from the API, try again in a moment.")
+            elif lookup_cache.hits:
+                st.caption("Answered from the cache")
+            st.dataframe(pd.DataFrame({"Field": EXPECTED_HEADERS, "Value": [str(v) for v in values]}), hide_index=True)
 
 if uploaded_file:
-    df = pd.read_excel(uploaded_file, dtype=str)
-    df.columns = df.columns.str.strip()
+    data = uploaded_file.getvalue()
+    upload_info = inspect_upload(hashlib.sha256(data).hexdigest(), uploaded_file.name, data)
     
-    if "Phone_Number" not in df.columns:
+    if upload_info is None:
         st.error("❌ 'Phone_Number' column is missing! Please upload a valid file.")
     else:
         st.success("✅ File uploaded successfully!")
+        st.write(
+            f"**{upload_info['rows']}** rows · **{upload_info['plausible']}** plausible numbers · "
+            f"**{sync_processed_index(get_processed_index(), store_path_for(OUTPUT_FILE))}** numbers already processed"
+        )
         
-        # 📝 Load Already Processed Phone Numbers
-        processed_numbers = set()
-        if os.path.exists(OUTPUT_FILE):
-            try:
-                df_output = pd.read_excel(OUTPUT_FILE, dtype=str)
-                if "Query" in df_output.columns:
-                    processed_numbers = set(df_output["Query"].dropna().str.strip().str.replace(" ", "").str.replace("-", ""))
-            except:
-                pass
-        
-        results = []
-        progress_bar = st.progress(0)
-        total_numbers = len(df)
-        
-        for index, phone_number in enumerate(df["Phone_Number"].dropna().astype(str), start=1):
-            phone_number = phone_number.strip().replace(" ", "").replace("-", "")
-            
-            if phone_number in processed_numbers:
-                continue
-            
-            if not phone_number.startswith("+"):
-                results.append(["INVALID_FORMAT"] + ["N/A"] * (len(EXPECTED_HEADERS) - 2) + [phone_number])
-                continue
-            
-            url = f"{API_BASE_URL}?number={phone_number}&fields={FIELDS}"
-            
-            try:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    values = response.text.strip().split(",")
-                    values += ["N/A"] * (len(EXPECTED_HEADERS) - len(values))
-                else:
-                    values = ["API_ERROR"] + ["N/A"] * (len(EXPECTED_HEADERS) - 2) + [phone_number]
-            except:
-                values = ["REQUEST_FAILED"] + ["N/A"] * (len(EXPECTED_HEADERS) - 2) + [phone_number]
-                
-            results.append(values)
-            progress_bar.progress(index / total_numbers)
-            time.sleep(12)  # Enforcing API rate limit
-            
-            if index % 5 == 0 and results:
-                new_data = pd.DataFrame(results, columns=EXPECTED_HEADERS)
-                append_to_excel(new_data, OUTPUT_FILE)
-                results = []  # Clear results list
-        
-        if results:
-            new_data = pd.DataFrame(results, columns=EXPECTED_HEADERS)
-            append_to_excel(new_data, OUTPUT_FILE)
-        
-        st.success("✅ Processing complete! Data saved incrementally.")
+        if st.button("🚀 Start validation"):
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            input_path = os.path.join(JOBS_DIR, f"{uuid.uuid4().hex[:8]}_{os.path.basename(uploaded_file.name)}")
+            with open(input_path, "wb") as f:
+                f.write(data)
+            job_id = job_manager.submit(uploaded_file.name, validate_file, input_path, lookup_mode,
+                                        cleanup=lambda: os.remove(input_path))  # Cancelled while queued
+            # Remember the job in the session and the URL, so a page reload finds it again
+            st.session_state["job_id"] = job_id
+            st.query_params["job"] = job_id
+
+# 📋 Current job of this session (or of the ?job= link after a reload)
+job_id = st.session_state.get("job_id") or st.query_params.get("job")
+job = job_manager.get(job_id) if job_id else None
+
+if job is not None:
+    st.subheader(f"Job {job.id} · {job.name}")
+    st.progress(job.progress)
+    st.write(f"**Status:** {job.status} · {job.processed} / {job.total or '?'} rows")
+    if job.message:
+        st.caption(job.message)
+    
+    if job.status in ACTIVE_STATES:
+        if st.button("✋ Cancel job"):
+            job_manager.cancel(job.id)
+            st.rerun()
+    elif job.status == JOB_FAILED:
+        st.error(job.message)
+    elif job.result:
+        if job.result["dropped"]:
+            st.warning(f"🧹 {sum(job.result['dropped'].values())} rows dropped before validation")
+            st.dataframe(pd.Series(job.result["dropped"], name="Rows").to_frame())
+        st.info(job.result["cache"])
+    
+
+# 📥 Downloads of everything stored so far; nothing is exported until a button is clicked
+if os.path.exists(store_path_for(OUTPUT_FILE)) and not st.get_option("server.enableStaticServing"):
+    st.warning("📥 Downloads need Streamlit's static file serving: set enableStaticServing = true "
+               "under [server] in .streamlit/config.toml.")
+elif os.path.exists(store_path_for(OUTPUT_FILE)):
+    version = get_results_explorer().version()
+    fits_sheet = count_results(version, ()) < EXCEL_MAX_ROWS
+    extensions = ([".xlsx"] if fits_sheet else []) + [".csv", ".csv.gz"] + ([".parquet"] if PARQUET_AVAILABLE else [])
+    for extension, slot in zip(extensions, st.columns(len(extensions))):
+        with slot:
+            path = cached_export_path(version, EXPORTS_DIR, extension, name=EXPORT_NAME)
+            if not os.path.exists(path) and st.button(f"📦 Prepare {extension}", key=f"export_{extension}"):
+                with st.spinner(f"Exporting {extension}..."):
+                    path = export_download(extension)
+            if os.path.exists(path):
+                export_link(path, extension)
+
+# 🔍 Results explorer: only the requested page of rows is sent to the browser
+if os.path.exists(store_path_for(OUTPUT_FILE)):
+    with st.expander("🔍 Explore results"):
+        explorer = get_results_explorer()
+        summaries = explorer.summaries()
+        filters = {}
+        slots = st.columns(len(CHOICE_FILTERS) + len(FLAG_FILTERS))
+        for column, slot in zip(CHOICE_FILTERS, slots):
+            filters[column] = tuple(slot.multiselect(column, summaries["options"][column]))
+        for column, slot in zip(FLAG_FILTERS, slots[len(CHOICE_FILTERS):]):
+            choice = slot.selectbox(column, ("any", "true", "false"))
+            filters[column] = None if choice == "any" else choice == "true"
+        matches = count_results(explorer.version(), tuple(filters.items()))
+        pages = max(1, -(-matches // PAGE_SIZE))
+        # Keyed by the filters, so changing them goes back to page 1
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"results_page_{hash(tuple(filters.items()))}")
+        first = (page - 1) * PAGE_SIZE
+        st.caption(f"{matches} matching results · rows {min(first + 1, matches)}–{min(first + PAGE_SIZE, matches)}")
+        st.dataframe(explorer.page(filters, page - 1), hide_index=True)
         
-        with open(OUTPUT_FILE, "rb") as f:
-            st.download_button(
-                label="📥 Download Processed File",
-                data=f,
-                file_name=OUTPUT_FILE,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        st.caption(f"Valid rate by country (all {summaries['rows']} results)")
+        st.dataframe(
+            pd.DataFrame(summaries["valid_by_country"]), hide_index=True,
+            column_config={"Valid Rate": st.column_config.ProgressColumn(min_value=0, max_value=1, format="%.2f")},
+        )
+        st.caption("Top carriers")
+        st.dataframe(pd.DataFrame(summaries["top_carriers"]), hide_index=True)
+
+with st.expander("🗂️ All jobs on this server"):
+    jobs = job_manager.list_jobs()
+    if jobs:
+        st.dataframe(pd.DataFrame([j.snapshot() for j in jobs]), hide_index=True)
+    else:
+        st.write("No jobs yet.")
+
+with st.expander("📊 Performance metrics"):
+    stage_rows = metrics.REGISTRY.stage_rows()
+    if stage_rows:
+        st.caption("Where the time goes, per pipeline stage (all jobs since the server started)")
+        st.dataframe(pd.DataFrame(stage_rows), hide_index=True)
+        st.dataframe(pd.DataFrame(metrics.REGISTRY.counter_rows()), hide_index=True)
+    else:
+        st.write("No measurements yet.")
+    st.caption("Requests per API key")
+    st.dataframe(pd.DataFrame(get_key_pool().usage_rows()), hide_index=True)
 
 def main():
     st.write("**Important Instruction**: Your file must have a column called **< Phone_Number >** to work this code")
 
 if __name__ == "__main__":
     main()
+
+# ⏱️ Poll while the job is active; widget clicks still interrupt and rerun immediately
+if job is not None and job.status in ACTIVE_STATES:
+    time.sleep(POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,181 @@
+import argparse
+import csv
+import io
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from offline_metadata import OfflineMetadata
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+# ⚙️ How the stub behaves; every knob defaults to "fast and well-behaved"
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, requests_per_window=None,
+                 window_seconds=60, seed=None):
+        self.latency = latency                          # Seconds added to every response
+        self.jitter = jitter                            # ± uniform noise on top of latency
+        self.error_rate = error_rate                    # Share of requests answered with HTTP 500
+        self.requests_per_window = requests_per_window  # None = never throttle
+        self.window_seconds = window_seconds
+        self.random = random.Random(seed)
+
+
+# 🪟 Fixed-window quota like the real API: X-Rl = requests left, X-Ttl = seconds until reset
+class StubQuota:
+    def __init__(self, requests_per_window, window_seconds, clock=time.monotonic):
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.clock = clock
+        self.window_start = clock()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    # Returns (allowed, remaining, ttl)
+    def take(self):
+        with self.lock:
+            now = self.clock()
+            if now - self.window_start >= self.window_seconds:
+                self.window_start = now
+                self.used = 0
+            ttl = max(1, int(round(self.window_seconds - (now - self.window_start))))
+            if self.used >= self.requests_per_window:
+                return False, 0, ttl
+            self.used += 1
+            return True, self.requests_per_window - self.used, ttl
+
+
+# 🎭 Plausible API answers, built from the offline numbering plan so they match what the API would say
+class StubResponder:
+    def __init__(self):
+        self.offline = OfflineMetadata()
+
+    def answer(self, phone_number, fields):
+        result = self.offline.lookup(phone_number)
+        if result["status"] == "fail":
+            result.setdefault("message", "invalid number")
+        else:
+            result.update(
+                status="success",
+                message="",
+                isDisposible="false",
+                numberAreaCode=result["formatE164"][1 + len(result["numberCountryCode"]):][:3],
+                carrier="Stub Telecom",
+                region="",
+                regionName="",
+                city="",
+                zip="",
+                offset="0",
+            )
+        values = [result.get(field, "") for field in fields.split(",")]
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(values)
+        return buffer.getvalue()
+
+
+# 🌐 Handles GET /csv/?number=...&fields=... the way phone-number-api.com does
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if not url.path.startswith("/csv"):
+            return self._reply(404, "not found\n")
+        params = parse_qs(url.query)
+        phone_number = params.get("number", [""])[0]
+        fields = params.get("fields", ["status,query"])[0]
+
+        headers = {}
+        if server.quota is not None:
+            allowed, remaining, ttl = server.quota.take()
+            headers = {"X-Rl": str(remaining), "X-Ttl": str(ttl)}
+            if not allowed:
+                server.count("throttled")
+                return self._reply(429, "quota exceeded\n", headers)
+
+        config = server.config
+        with server.lock:
+            delay = config.latency + config.random.uniform(-config.jitter, config.jitter)
+            failed = config.random.random() < config.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            server.count("errors")
+            return self._reply(500, "internal error\n", headers)
+
+        server.count("ok")
+        self._reply(200, server.responder.answer(phone_number, fields), headers)
+
+    def _reply(self, status, body, headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Thousands of requests per second would drown the console
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.quota = StubQuota(config.requests_per_window, config.window_seconds) \
+            if config.requests_per_window else None
+        self.responder = StubResponder()
+        self.lock = threading.Lock()
+        self.stats = {"ok": 0, "errors": 0, "throttled": 0}
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats[outcome] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/csv/"
+
+
+# 🚀 Start a stub on a background thread (port 0 = any free port); stop it with server.shutdown()
+def start_stub(config=None, host=DEFAULT_HOST, port=0):
+    server = StubServer((host, port), config or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the phone-number-api.com /csv/ endpoint")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± seconds of uniform noise")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--requests-per-window", type=int, default=None, help="quota before HTTP 429 (default: none)")
+    parser.add_argument("--window-seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.requests_per_window,
+                        args.window_seconds, args.seed)
+    server = StubServer((args.host, args.port), config)
+    print(f"🎭 Stub API listening on {server.url} (set PHONE_API_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"🛑 Stopped. {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import collections
+import glob
+import os
+import re
+import time
+
+import pandas as pd
+
+import metrics
+from input_reader import PHONE_COLUMN, PhoneNumberReader, phone_sheets
+from lookup_session import LookupSession, add_lookup_arguments
+from prevalidation import prevalidate_numbers
+from result_schema import EXPECTED_HEADERS
+from result_store import EXCEL_MAX_ROWS, ResultWriter, open_result_store, write_excel
+
+SOURCE_EXTENSIONS = (".xlsx", ".csv")
+STORE_FILE = "results.xlsx"     # Shared store of the batch (results.db), reused by the next batch
+MANIFEST_FILE = "manifest.csv"  # One row per source: where its output went and what is in it
+OUTPUT_FORMATS = ("xlsx", "csv")
+
+
+# 📂 Input files named by the arguments: directories (their .xlsx/.csv files) and globs, in order, once each
+def discover_files(patterns):
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(glob.escape(pattern), "*"))
+        else:
+            matches = glob.glob(pattern)
+        for path in sorted(matches):
+            name = os.path.basename(path)
+            if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS and not name.startswith("~$"):
+                files.append(os.path.abspath(path))
+    return list(dict.fromkeys(files))
+
+
+# 🔎 Every (file, sheet) with a Phone_Number column; files without one go to the manifest as skipped
+def discover_sources(files):
+    sources, skipped = [], []
+    for path in files:
+        try:
+            sheets = phone_sheets(path)
+        except Exception as e:
+            skipped.append({"Source": path, "Note": f"unreadable: {e}"})
+            continue
+        if not sheets:
+            skipped.append({"Source": path, "Note": f"no '{PHONE_COLUMN}' column"})
+        sources += [{"file": path, "sheet": sheet} for sheet in sheets]
+    return sources, skipped
+
+
+# 📄 Output file of one source: <file stem>[.<sheet>].<format>, made unique within the batch
+def source_output(output_dir, source, extension, used):
+    name = os.path.splitext(os.path.basename(source["file"]))[0]
+    if source["sheet"] is not None:
+        name += "." + source["sheet"]
+    name = re.sub(r"[^\w.-]+", "_", name)
+    path, counter = os.path.join(output_dir, f"{name}.{extension}"), 1
+    while path in used:
+        counter += 1
+        path = os.path.join(output_dir, f"{name}_{counter}.{extension}")
+    used.add(path)
+    return path
+
+
+# 📋 Phase 1: read every source once and build one work list of distinct numbers
+# Numbers seen in an earlier source, or already in the shared store, are not listed again.
+def collect_numbers(sources, store):
+    pending = {}  # Insertion-ordered set: the work list, in first-seen order
+    repeated = already_stored = 0
+    for source in sources:
+        reader = PhoneNumberReader(source["file"], sheet_name=source["sheet"])
+        counts = collections.Counter()
+        try:
+            for chunk in reader.chunks():
+                checked = prevalidate_numbers(chunk)
+                plausible = checked.loc[checked["Reject Reason"].isna(), "Normalized"].drop_duplicates()
+                counts["rows"] += len(chunk)
+                counts["rejected"] += len(chunk) - int(checked["Reject Reason"].isna().sum())
+                fresh = plausible[[number not in pending for number in plausible]]
+                repeated += len(plausible) - len(fresh)
+                stored = store.index.contains_many(fresh)
+                already_stored += int(stored.sum())
+                pending.update(dict.fromkeys(fresh[~stored]))
+        finally:
+            reader.close()
+        source.update(rows=counts["rows"], rejected=counts["rejected"])  # Zero for an empty sheet
+    return list(pending), repeated, already_stored
+
+
+# 🌐 Phase 2: look the work list up under one shared key pool, saving into the shared store
+def lookup_numbers(args, numbers, store):
+    session = LookupSession(args)
+    writer = ResultWriter(store)
+    try:
+        for index, (phone_number, values) in enumerate(session.lookup_many(numbers), 1):
+            writer.put(values)
+            if index % 100 == 0:
+                print(f"   … {index + session.failed} / {len(numbers)} numbers")
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted, writing outputs with the results received so far...")
+    finally:
+        writer.close()
+        session.close()
+
+    print(f"💾 Saved {writer.written} results, {session.failed} numbers failed (looked up again next batch)")
+    print(f"📡 API calls made: {session.api_calls}")
+    print(session.summary())
+
+
+# 📤 Phase 3: one output per source, its rows in input order with their results joined back
+# Rows that were rejected keep their reason; plausible rows without a result (failed or
+# interrupted lookups) have empty result columns and are counted in the manifest.
+# Both formats are written one chunk at a time (.xlsx through write_excel's constant_memory mode).
+def write_source_output(store, source, output_file):
+    reader = PhoneNumberReader(source["file"], sheet_name=source["sheet"])
+    counts = {"found": 0, "missing": 0}
+    columns = [PHONE_COLUMN, "Reject Reason"] + EXPECTED_HEADERS
+
+    def output_frames():
+        for chunk in reader.chunks():
+            checked = prevalidate_numbers(chunk)
+            plausible = checked["Reject Reason"].isna()
+            results = store.rows_for(checked.loc[plausible, "Normalized"])
+            joined = results.reindex(checked["Normalized"].where(plausible))
+            joined.index = checked.index
+            has_result = joined["Query"].notna()
+            counts["found"] += int(has_result.sum())
+            counts["missing"] += int((plausible & ~has_result).sum())
+            yield pd.concat([checked[[PHONE_COLUMN, "Reject Reason"]], joined], axis=1)
+
+    try:
+        if output_file.endswith(".csv"):
+            tmp_path = output_file + ".tmp.csv"
+            with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+                out.write(pd.DataFrame(columns=columns).to_csv(index=False))
+                for frame in output_frames():
+                    frame.to_csv(out, index=False, header=False)
+        else:
+            tmp_path = output_file + ".tmp.xlsx"
+            write_excel(tmp_path, columns, output_frames(), sheet_name=(source["sheet"] or "Sheet1")[:31])
+    finally:
+        reader.close()
+    os.replace(tmp_path, output_file)
+    return counts["found"], counts["missing"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate every sheet with a Phone_Number column in a set of workbooks as one batch: "
+                    "numbers are looked up once under a shared rate budget, and each sheet gets its own output",
+    )
+    parser.add_argument("sources", nargs="+", help="directories, .xlsx/.csv files or globs (quote them)")
+    parser.add_argument("--output-dir", "-o", required=True,
+                        help=f"per-source outputs, {MANIFEST_FILE} and the shared store ({STORE_FILE} → .db)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="xlsx", help="per-source output format")
+    add_lookup_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    files = discover_files(args.sources)
+    sources, skipped = discover_sources(files)
+    if not sources:
+        print(f"❌ Error: No .xlsx/.csv file with a '{PHONE_COLUMN}' column found in {args.sources}!")
+        return 1
+    print(f"🚀 Batch of {len(sources)} sheets from {len(files)} files")
+    for entry in skipped:
+        print(f"   ⚠️ Skipping '{entry['Source']}': {entry['Note']}")
+
+    store = open_result_store(os.path.join(args.output_dir, STORE_FILE), EXPECTED_HEADERS)
+    try:
+        numbers, repeated, already_stored = collect_numbers(sources, store)
+        print(f"📋 {len(numbers)} distinct numbers to look up "
+              f"({repeated} repeats across sheets, {already_stored} already in '{store.path}')")
+        lookup_numbers(args, numbers, store)
+
+        manifest, used = [], set()
+        for source in sources:
+            # A .csv source too long for one sheet is written as .csv whatever the format
+            extension = "csv" if source["rows"] >= EXCEL_MAX_ROWS else args.format
+            output_file = source_output(args.output_dir, source, extension, used)
+            found, missing = write_source_output(store, source, output_file)
+            manifest.append({
+                "Source": source["file"], "Sheet": source["sheet"] or "", "Output": output_file,
+                "Rows": source["rows"], "Rejected": source["rejected"], "With Result": found,
+                "Without Result": missing, "Note": "rerun to complete" if missing else "",
+            })
+            print(f"   • {output_file}: {source['rows']} rows, {found} with results, {missing} without")
+        manifest += skipped
+        manifest_file = os.path.join(args.output_dir, MANIFEST_FILE)
+        manifest = pd.DataFrame(manifest, columns=list(manifest[0]))
+        counts = ["Rows", "Rejected", "With Result", "Without Result"]
+        manifest[counts] = manifest[counts].astype("Int64")  # Skipped files have none
+        manifest.to_csv(manifest_file, index=False)
+        print(f"🧾 Manifest written to '{manifest_file}'")
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    finally:
+        store.close()
+        store.index.close()
+
+    print(metrics.REGISTRY.summary())
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
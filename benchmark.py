@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import json
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource  # Not available on Windows; peak RSS is then reported as None
+except ImportError:
+    resource = None
+
+from api_stub import StubConfig, StubResponder, start_stub
+from response_parser import ResponseParser
+from result_schema import FIELDS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_RESULTS = os.path.join(HERE, "benchmarks", "results.jsonl")
+
+# 🧪 Pipelines under test: the two CLI scripts and the GUI's validate_file, run headless
+PIPELINES = {
+    "incremental": os.path.join(HERE, "PhoneValidatorIncrementalCheckandUpload.py"),
+    "loop5": os.path.join(HERE, "PhoneNumberValidator_Loop5ReqperMinute_IncrementalSave.py"),
+    "gui": os.path.join(HERE, "PhoneValidator_GUI_Enhanced.py"),
+}
+DEFAULT_ROWS = (1000, 100_000)  # Add 1000000 explicitly, it takes a while
+
+# 📞 Synthetic numbers: (calling code + leading digits, digits that follow)
+NUMBER_TEMPLATES = [("+447", 9), ("+1", 10), ("+4915", 9), ("+919", 9), ("+336", 8), ("+5511", 9)]
+INVALID_SHARE = 0.03
+DUPLICATE_SHARE = 0.05
+
+# 🧩 Response parsing benchmark
+PARSE_SAMPLES = 100_000
+
+
+# 🏭 Write `rows` synthetic numbers with some malformed and duplicate entries mixed in
+def make_input(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    template = rng.integers(len(NUMBER_TEMPLATES), size=rows)
+    numbers = np.empty(rows, dtype=object)
+    for i, (prefix, length) in enumerate(NUMBER_TEMPLATES):
+        picked = template == i
+        digits = rng.integers(10 ** (length - 1), 10 ** length, size=int(picked.sum()))
+        numbers[picked] = [prefix + str(d) for d in digits]
+    invalid = rng.random(rows) < INVALID_SHARE
+    numbers[invalid] = [n[1:] for n in numbers[invalid]]  # Missing "+"
+    duplicate = np.flatnonzero(rng.random(rows) < DUPLICATE_SHARE)
+    duplicate = duplicate[duplicate > 0]
+    numbers[duplicate] = numbers[rng.integers(0, duplicate)]
+
+    df = pd.DataFrame({"Phone_Number": numbers})
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        # The CLI scripts read "Sheet2", the GUI reads the first sheet
+        with pd.ExcelWriter(path, engine="xlsxwriter", engine_kwargs={"options": {"constant_memory": True}}) as writer:
+            df.to_excel(writer, sheet_name="Sheet2", index=False)
+    return path
+
+
+# ⏱️ Wrap a method so every call's duration lands in `timings`
+def _timed(cls, name, timings):
+    original = getattr(cls, name)
+
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+
+    setattr(cls, name, wrapper)
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else None
+
+
+# 🧒 Child process: run one pipeline with instrumentation and write its metrics to `metrics_path`
+def run_child(pipeline, input_path, metrics_path):
+    import metrics
+    from job_runner import Job
+    from phone_api import PhoneApiClient
+    from result_store import ResultStore
+
+    lookups, appends, exports = [], [], []
+    _timed(PhoneApiClient, "lookup", lookups)
+    _timed(ResultStore, "append", appends)
+    _timed(ResultStore, "export_to_excel", exports)
+
+    error = None
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            if pipeline == "gui":
+                gui = runpy.run_path(PIPELINES["gui"], run_name="__benchmark__")
+                validate_file = gui["validate_file"]
+                # Same budget knobs the CLI scripts read from the environment
+                validate_file.__globals__.update(
+                    REQUESTS_PER_WINDOW=int(os.environ["PHONE_API_REQUESTS_PER_WINDOW"]),
+                    WINDOW_SECONDS=float(os.environ["PHONE_API_WINDOW_SECONDS"]),
+                    MAX_IN_FLIGHT=int(os.environ["PHONE_API_MAX_IN_FLIGHT"]),
+                )
+                gui["get_key_pool"].clear()  # Built with the default budget while the page rendered
+                job = Job("benchmark", os.path.basename(input_path), validate_file, (), {})
+                validate_file(job, input_path, os.environ["PHONE_LOOKUP_MODE"])
+            else:
+                runpy.run_path(PIPELINES[pipeline], run_name="__main__")
+        except SystemExit as e:
+            error = f"exited early ({e.code})"
+        except Exception as e:
+            error = repr(e)
+    wall = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    with open(metrics_path, "w") as f:
+        json.dump({
+            "wall_s": wall,
+            "lookups": len(lookups),
+            "p50_ms": _percentile(lookups, 50),
+            "p99_ms": _percentile(lookups, 99),
+            "append_s": sum(appends),
+            "export_s": sum(exports),
+            "peak_rss_mb": peak_rss,
+            "stages": {row["Stage"]: row["Total s"] for row in metrics.REGISTRY.stage_rows()},
+            "error": error,
+        }, f)
+
+
+# ⏱️ Parse cost per 100k responses: requests' .text plus split(",") (the old way) vs ResponseParser on .content
+def benchmark_parser(samples=PARSE_SAMPLES):
+    import requests
+
+    responder = StubResponder()
+    numbers = [f"+4479{n:08d}" for n in range(1000)]
+    bodies = {"plain": [responder.answer(n, FIELDS).encode("utf-8") for n in numbers]}
+    bodies["quoted"] = [b.replace(b"Stub Telecom", b'"Stub Telecom, Inc."') for b in bodies["plain"]]
+    parser = ResponseParser(FIELDS)
+
+    def responses(case):
+        for i in range(samples):
+            response = requests.models.Response()
+            response._content = bodies[case][i % len(numbers)]
+            response.status_code = 200
+            yield response
+
+    results = []
+    for case in ("plain", "quoted"):
+        for method, parse in (("text_split", lambda r: r.text.strip().split(",")),
+                              ("response_parser", lambda r: parser.parse(r.content))):
+            prepared = list(responses(case))
+            start = time.perf_counter()
+            for response in prepared:
+                parse(response)
+            seconds = time.perf_counter() - start
+            results.append({"benchmark": "parser", "case": case, "method": method,
+                            "seconds_per_100k": seconds * 100_000 / samples})
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 🏃 Run one pipeline in a fresh process (so peak RSS is its own) against the stub
+def run_pipeline(pipeline, input_path, rows, stub, args, workdir):
+    env = dict(os.environ)
+    env.update(
+        PHONE_API_BASE_URL=stub.url,
+        PHONE_LOOKUP_CACHE=os.path.join(workdir, "lookup_cache.db"),
+        PHONE_VALIDATOR_INPUT=input_path,
+        PHONE_VALIDATOR_OUTPUT=os.path.join(workdir, "output.xlsx"),
+        PHONE_API_REQUESTS_PER_WINDOW=str(args.requests_per_window or args.client_rate),
+        PHONE_API_WINDOW_SECONDS=str(args.window_seconds if args.requests_per_window else 1),
+        PHONE_API_MAX_IN_FLIGHT=str(args.max_in_flight),
+        PHONE_LOOKUP_MODE=args.mode,
+        PYTHONPATH=os.pathsep.join(filter(None, [HERE, env.get("PYTHONPATH")])),
+    )
+    metrics_path = os.path.join(workdir, "metrics.json")
+    stats_before = dict(stub.stats)
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--child", pipeline, input_path, metrics_path],
+                   cwd=workdir, env=env, check=True)
+    with open(metrics_path) as f:
+        metrics = json.load(f)
+
+    metrics.update(
+        pipeline=pipeline,
+        rows=rows,
+        rows_per_s=rows / metrics["wall_s"] if metrics["wall_s"] else None,
+        persist_s=metrics["append_s"] + metrics["export_s"],
+        stub={k: v - stats_before[k] for k, v in stub.stats.items()},
+    )
+    return metrics
+
+
+def _fmt(value, digits=1):
+    return "-" if value is None else f"{value:,.{digits}f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the validation pipelines against a local API stub")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS))
+    parser.add_argument("--pipelines", nargs="+", choices=sorted(PIPELINES), default=sorted(PIPELINES))
+    parser.add_argument("--mode", default="live", choices=("live", "hybrid", "offline"))
+    parser.add_argument("--format", default="csv", choices=("csv", "xlsx"), help="synthetic input format")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-window", type=int, default=None,
+                        help="stub quota (429 + X-Rl/X-Ttl); the client gets the same budget")
+    parser.add_argument("--window-seconds", type=float, default=60)
+    parser.add_argument("--client-rate", type=int, default=1_000_000,
+                        help="client requests per second when the stub has no quota")
+    parser.add_argument("--results", default=BENCHMARK_RESULTS, help="JSON lines file the runs are appended to")
+    parser.add_argument("--parser", action="store_true", help="only benchmark response parsing")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(*args.child)
+
+    if args.parser:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        commit = _git_commit()
+        with open(args.results, "a") as f:
+            for result in benchmark_parser():
+                result.update(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"), commit=commit)
+                f.write(json.dumps(result) + "\n")
+                print(f"🧩 {result['case']:<7} {result['method']:<16} {result['seconds_per_100k']:.3f} s per 100k responses")
+        return
+
+    stub = start_stub(StubConfig(args.latency, args.jitter, args.error_rate, args.requests_per_window,
+                                 args.window_seconds, seed=0))
+    print(f"🎭 Stub API on {stub.url}")
+    commit = _git_commit()
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+
+    print(f"{'pipeline':<12} {'rows':>9} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>8} {'persist s':>10} {'wall s':>8}")
+    try:
+        for rows in args.rows:
+            for pipeline in args.pipelines:
+                with tempfile.TemporaryDirectory(prefix="phone_bench_") as workdir:
+                    input_path = make_input(os.path.join(workdir, f"input.{args.format}"), rows)
+                    metrics = run_pipeline(pipeline, input_path, rows, stub, args, workdir)
+                metrics.update(
+                    timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    commit=commit,
+                    mode=args.mode,
+                    format=args.format,
+                    max_in_flight=args.max_in_flight,
+                    stub_config={"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                                 "requests_per_window": args.requests_per_window,
+                                 "window_seconds": args.window_seconds},
+                )
+                with open(args.results, "a") as f:
+                    f.write(json.dumps(metrics) + "\n")
+                print(f"{pipeline:<12} {rows:>9,} {_fmt(metrics['rows_per_s']):>10} {_fmt(metrics['p50_ms'], 2):>8} "
+                      f"{_fmt(metrics['p99_ms'], 2):>8} {_fmt(metrics['peak_rss_mb']):>8} "
+                      f"{_fmt(metrics['persist_s'], 2):>10} {_fmt(metrics['wall_s'], 2):>8}"
+                      + (f"  ⚠️ {metrics['error']}" if metrics["error"] else ""))
+    finally:
+        stub.shutdown()
+    print(f"💾 Results appended to '{args.results}'")
+
+
+if __name__ == "__main__":
+    main()
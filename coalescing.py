@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+
+# 🤝 Single-flight table: concurrent callers asking for the same key share one call
+# The first caller (the leader) runs the function; everyone arriving while it is in
+# flight waits for the same result, or the same exception. Nothing is kept after the
+# call finishes; finished results are the lookup cache's job.
+class InflightRequests:
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.calls)
+
+    def run(self, key, fn):
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+        if not leader:
+            metrics.count("lookups_coalesced")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+# One table per process, so GUI sessions and jobs running side by side share lookups
+SHARED_INFLIGHT = InflightRequests()
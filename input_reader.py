@@ -0,0 +1,120 @@
+import os
+
+import time
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import metrics
+
+PHONE_COLUMN = "Phone_Number"
+CHUNK_SIZE = 5000  # Rows per chunk handed to the vectorized pre-validation
+
+
+# 🔢 Excel cells arrive as str/int/float; keep them as text like read_excel(dtype=str)
+def _cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# 🔎 Sheets of an .xlsx with the column in their header row ([None] for a .csv that has it)
+def phone_sheets(path, column=PHONE_COLUMN):
+    if os.path.splitext(path)[1].lower() == ".csv":
+        columns = [c.strip() for c in pd.read_csv(path, nrows=0).columns]
+        return [None] if column in columns else []
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for sheet in workbook.worksheets:
+            header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            if column in [str(c).strip() if c is not None else "" for c in header]:
+                sheets.append(sheet.title)
+        return sheets
+    finally:
+        workbook.close()
+
+
+# 📥 Streaming reader for the Phone_Number column of an .xlsx or .csv
+# Rows are read lazily (openpyxl read-only mode / chunked read_csv) and handed out
+# as pandas Series chunks indexed by row number, so memory stays flat in input size.
+class PhoneNumberReader:
+    def __init__(self, source, sheet_name=None, column=PHONE_COLUMN, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.sheet_name = sheet_name
+        self.column = column
+        self.chunk_size = chunk_size
+        self.total_rows = None  # Best-effort row count for progress bars
+        self.workbook = None
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        self.is_csv = os.path.splitext(str(name))[1].lower() == ".csv"
+        if self.is_csv:
+            self._open_csv()
+        else:
+            self._open_excel()
+
+    def _open_excel(self):
+        self.workbook = load_workbook(self.source, read_only=True, data_only=True)
+        if self.sheet_name is None:
+            self.sheet = self.workbook.worksheets[0]
+        else:
+            self.sheet = self.workbook[self.sheet_name]
+        header = next(self.sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        columns = [str(c).strip() if c is not None else "" for c in header]
+        if self.column not in columns:
+            raise ValueError(f"'{self.column}' column is missing! Available columns: {columns}")
+        self.column_index = columns.index(self.column)
+        if self.sheet.max_row:
+            self.total_rows = self.sheet.max_row - 1
+
+    def _open_csv(self):
+        columns = [c.strip() for c in pd.read_csv(self.source, nrows=0).columns]
+        self._rewind()
+        if self.column not in columns:
+            raise ValueError(f"'{self.column}' column is missing! Available columns: {columns}")
+        self.csv_column = columns.index(self.column)
+
+    def _rewind(self):
+        if hasattr(self.source, "seek"):
+            self.source.seek(0)
+
+    # 🔄 Yield the column as Series chunks (index = 0-based data row number)
+    # Time spent producing each chunk (not the caller's time between chunks) is the input_read stage.
+    def chunks(self):
+        for chunk in self._read_chunks():
+            metrics.count("rows_read", len(chunk))
+            yield chunk
+
+    def _read_chunks(self):
+        started = time.perf_counter()
+        if self.is_csv:
+            self._rewind()
+            start = 0
+            for frame in pd.read_csv(self.source, dtype=str, usecols=[self.csv_column], chunksize=self.chunk_size):
+                series = frame.iloc[:, 0]
+                series.index = pd.RangeIndex(start, start + len(series))
+                start += len(series)
+                metrics.observe(metrics.STAGE_INPUT, time.perf_counter() - started)
+                yield series
+                started = time.perf_counter()
+            return
+
+        start, values = 0, []
+        column = self.column_index
+        for row in self.sheet.iter_rows(min_row=2, values_only=True):
+            values.append(_cell_text(row[column]) if column < len(row) else None)
+            if len(values) >= self.chunk_size:
+                metrics.observe(metrics.STAGE_INPUT, time.perf_counter() - started)
+                yield pd.Series(values, index=pd.RangeIndex(start, start + len(values)), dtype="object")
+                started = time.perf_counter()
+                start += len(values)
+                values = []
+        if values:
+            metrics.observe(metrics.STAGE_INPUT, time.perf_counter() - started)
+            yield pd.Series(values, index=pd.RangeIndex(start, start + len(values)), dtype="object")
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
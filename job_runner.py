@@ -0,0 +1,139 @@
+import queue
+import threading
+import time
+import traceback
+import uuid
+
+# 🚦 Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+# 📋 One background job: its state, progress counters and cancel flag
+class Job:
+    def __init__(self, job_id, name, fn, args, kwargs, cleanup=None):
+        self.id = job_id
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cleanup = cleanup  # Called instead of fn when the job is cancelled before it starts
+        self.status = JOB_QUEUED
+        self.processed = 0
+        self.total = None
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+    # 📈 Called by the job function to report progress
+    def update(self, processed=None, total=None, message=None):
+        with self.lock:
+            if processed is not None:
+                self.processed = processed
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+
+    # 🛑 Job functions check this between rows and stop early when set
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def progress(self):
+        if self.status == JOB_DONE:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.processed / self.total, 1.0)
+
+    # 🧾 Plain dict for tables and status panels
+    def snapshot(self):
+        with self.lock:
+            return {
+                "Job": self.id,
+                "File": self.name,
+                "Status": self.status,
+                "Processed": self.processed,
+                "Total": self.total,
+                "Message": self.message,
+                "Created": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+            }
+
+
+# 🏭 Queue of background jobs served by a fixed pool of worker threads
+# Lives for the whole server process (the GUI keeps it in st.cache_resource), so jobs
+# keep running across reruns and page reloads and several sessions share one queue.
+class JobManager:
+    def __init__(self, workers=1):
+        self.jobs = {}
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    # ➕ Queue fn(job, *args, **kwargs) and return the job ID
+    # cleanup() frees what fn would have (e.g. an input file) if the job never runs.
+    def submit(self, name, fn, *args, cleanup=None, **kwargs):
+        job = Job(uuid.uuid4().hex[:12], name, fn, args, kwargs, cleanup)
+        with self.lock:
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        return job.id
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    # Newest first
+    def list_jobs(self):
+        with self.lock:
+            return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    # ✋ Queued jobs are dropped, running jobs stop at their next check
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return False
+        job.cancel_event.set()
+        with job.lock:
+            dropped = job.status == JOB_QUEUED
+            if dropped:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        if dropped and job.cleanup is not None:
+            job.cleanup()
+        return True
+
+    def _worker(self):
+        while True:
+            job = self.queue.get()
+            with job.lock:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+            try:
+                result = job.fn(job, *job.args, **job.kwargs)
+                status = JOB_CANCELLED if job.cancelled else JOB_DONE
+                with job.lock:
+                    job.result = result
+            except Exception as e:
+                status = JOB_FAILED
+                with job.lock:
+                    job.error = f"{e}\n{traceback.format_exc()}"
+                    job.message = f"❌ {e}"
+            with job.lock:
+                job.status = status
+                job.finished_at = time.time()
@@ -0,0 +1,259 @@
+import collections
+import json
+import os
+import threading
+import time
+
+import metrics
+from rate_limiter import BURST_SIZE, REQUESTS_PER_WINDOW, WINDOW_SECONDS, TokenBucket
+from retry_queue import CIRCUIT_CLOSED, CircuitBreaker
+
+# 🔑 Pool configuration (both optional; without either the pool is the one free endpoint)
+API_KEYS_ENV = "PHONE_API_KEYS"  # Comma-separated keys, each with its own budget on PHONE_API_BASE_URL
+API_POOL_ENV = "PHONE_API_POOL"  # JSON file: [{"name", "url", "key", "requests_per_window", "window_seconds", "burst"}]
+KEY_PARAM = "key"                # Query parameter the provider reads the key from
+BULK_SHARE_ENV = "PHONE_BULK_QUOTA_SHARE"  # Share of the quota bulk lookups may use (0–1], the rest is headroom
+
+# 🚦 Priority lanes: interactive lookups take the next free slot ahead of bulk ones
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+YIELD_SECONDS = 0.05  # How long a bulk acquire backs off while an interactive one is waiting
+
+# Answers that mean the key itself is unusable (revoked, unpaid, forbidden), not the number
+DISABLING_STATUSES = {401, 402, 403}
+
+# 🧾 Per-key request outcomes, as counted in the run summary
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"          # Final API error for the number
+OUTCOME_FAILED = "failed"        # Network failure or transient 5xx
+OUTCOME_THROTTLED = "throttled"  # 429, the key's window is used up
+OUTCOMES = (OUTCOME_OK, OUTCOME_ERROR, OUTCOME_FAILED, OUTCOME_THROTTLED)
+
+
+# 🚫 Raised by KeyPool.acquire when every key has been dropped for good
+class NoUsableKeysError(RuntimeError):
+    pass
+
+
+# 🔑 One key on one endpoint, with its own rate budget, circuit breaker and usage counts
+class ApiEndpoint:
+    def __init__(self, name, base_url, api_key=None, rate_limiter=None, circuit_breaker=None, key_param=KEY_PARAM):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.key_param = key_param
+        self.rate_limiter = rate_limiter if rate_limiter is not None else TokenBucket()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker(name=name if api_key else None)
+        self.disabled = None  # Why the key left the rotation for good, if it did
+        self.usage = collections.Counter()
+        self.lock = threading.Lock()
+
+    def params(self, phone_number, fields):
+        params = {"number": phone_number, "fields": fields}
+        if self.api_key:
+            params[self.key_param] = self.api_key
+        return params
+
+    def record(self, outcome):
+        with self.lock:
+            self.usage[outcome] += 1
+        metrics.count("key_requests", key=self.name, outcome=outcome)
+
+    def state(self):
+        if self.disabled:
+            return f"disabled ({self.disabled})"
+        if self.circuit_breaker.state != CIRCUIT_CLOSED:
+            return f"circuit {self.circuit_breaker.state.replace('_', '-')}"
+        if self.rate_limiter.blocked_until > self.rate_limiter.clock():
+            return "quota exhausted"
+        return "active"
+
+
+# 🎛️ Spreads requests over several keys/endpoints
+# acquire() hands out the next key (round robin) that may send right now, skipping keys
+# whose circuit is open or whose quota is used up; when none may, it sleeps until the
+# soonest one can. The combined throughput is the sum of the keys' budgets. Keys the
+# provider rejects outright are disabled and never picked again.
+# Requests come in two lanes. Bulk acquires step aside while an interactive one is
+# waiting, and with bulk_share < 1 they are also spaced out to that share of the
+# combined rate, so the rest of the quota stays free for interactive lookups (in this
+# process, or a lookup_number.py run next to a bulk job).
+class KeyPool:
+    def __init__(self, endpoints, sleep=time.sleep, clock=time.monotonic, bulk_share=1.0):
+        self.endpoints = list(endpoints)
+        if not self.endpoints:
+            raise ValueError("A key pool needs at least one endpoint")
+        if not 0 < bulk_share <= 1:
+            raise ValueError(f"Bulk quota share must be in (0, 1], got {bulk_share}")
+        self.sleep = sleep
+        self.clock = clock
+        self.bulk_share = bulk_share
+        self.next_bulk_at = 0.0
+        self.interactive_waiting = 0
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    # 🎟️ Block until some key may send; returns (endpoint, seconds waited on circuits, seconds waited on budgets)
+    def acquire(self, lane=LANE_BULK):
+        interactive = lane == LANE_INTERACTIVE
+        if interactive:
+            with self.lock:
+                self.interactive_waiting += 1
+        try:
+            acquired = self._acquire(interactive)
+        finally:
+            if interactive:
+                with self.lock:
+                    self.interactive_waiting -= 1
+        metrics.count("pool_acquired", lane=lane)
+        return acquired
+
+    def _acquire(self, interactive):
+        circuit_wait = rate_wait = 0.0
+        while True:
+            with self.lock:
+                # Bulk keeps to its share of the rate and steps aside while an interactive request waits
+                gate = 0.0
+                if not interactive:
+                    gate = YIELD_SECONDS if self.interactive_waiting else self.next_bulk_at - self.clock()
+                if gate > 0:
+                    endpoint, soonest, waiting_on_circuit = None, gate, False
+                else:
+                    endpoint, soonest, waiting_on_circuit = self._take_slot()
+                if endpoint is not None:
+                    if not interactive and self.bulk_share < 1:
+                        self.next_bulk_at = self.clock() + self._bulk_interval()
+                    return endpoint, circuit_wait, rate_wait
+            self.sleep(soonest)
+            if waiting_on_circuit:
+                circuit_wait += soonest
+            else:
+                rate_wait += soonest
+
+    # One pass over the keys (lock held): (endpoint, None, None) when one may send now,
+    # else (None, seconds until the soonest may, whether that wait is an open circuit)
+    def _take_slot(self):
+        soonest, waiting_on_circuit = None, False
+        count = len(self.endpoints)
+        for offset in range(count):
+            index = (self.next_index + offset) % count
+            endpoint = self.endpoints[index]
+            if endpoint.disabled:
+                continue
+            # Check the circuit first so a key with an open circuit never spends a token
+            pause = endpoint.circuit_breaker.ready_in()
+            on_circuit = pause > 0
+            if not on_circuit:
+                pause = endpoint.rate_limiter.try_acquire()
+                if pause <= 0:
+                    endpoint.circuit_breaker.try_pass()
+                    self.next_index = (index + 1) % count
+                    return endpoint, None, None
+            if soonest is None or pause < soonest:
+                soonest, waiting_on_circuit = pause, on_circuit
+        if soonest is None:
+            reasons = ", ".join(f"{e.name}: {e.disabled}" for e in self.endpoints)
+            raise NoUsableKeysError(f"Every API key has been disabled ({reasons})")
+        return None, soonest, waiting_on_circuit
+
+    # Seconds between bulk requests when bulk may only use `bulk_share` of the combined rate
+    def _bulk_interval(self):
+        rate = sum(e.rate_limiter.rate for e in self.endpoints if not e.disabled)
+        return 1 / (rate * self.bulk_share) if rate else 0.0
+
+    # 🚫 Take a key out of the rotation for good
+    def disable(self, endpoint, reason):
+        with self.lock:
+            if endpoint.disabled:
+                return
+            endpoint.disabled = reason
+        metrics.count("keys_disabled")
+        print(f"🔑 Dropped API key '{endpoint.name}' from the rotation: {reason}")
+
+    # 🧾 One row per key for tables
+    def usage_rows(self):
+        rows = []
+        for endpoint in self.endpoints:
+            with endpoint.lock:
+                usage = dict(endpoint.usage)
+            row = {"Key": endpoint.name, "Requests": sum(usage.values())}
+            row.update({outcome.capitalize(): usage.get(outcome, 0) for outcome in OUTCOMES})
+            row["State"] = endpoint.state()
+            row["Budget"] = endpoint.rate_limiter.describe()
+            rows.append(row)
+        return rows
+
+    # 🖨️ Per-key usage for the run summary
+    def summary(self):
+        lines = ["🔑 API key usage:"]
+        for row in self.usage_rows():
+            lines.append(f"   • {row['Key']:<16} {row['Requests']:>7} requests "
+                         f"({row['Ok']} ok, {row['Error']} errors, {row['Failed']} failed, "
+                         f"{row['Throttled']} throttled) · {row['Budget']} · {row['State']}")
+        return "\n".join(lines)
+
+    def describe(self):
+        if len(self.endpoints) == 1:
+            text = self.endpoints[0].rate_limiter.describe()
+        else:
+            text = f"{len(self.endpoints)} keys: " + ", ".join(
+                f"{e.name} {e.rate_limiter.describe()}" for e in self.endpoints
+            )
+        if self.bulk_share < 1:
+            text += f", bulk share {self.bulk_share:.0%}"
+        return text
+
+
+# Short label for a key that does not give the key away in logs
+def key_label(api_key, position):
+    return f"key{position}…{api_key[-4:]}" if len(api_key) > 8 else f"key{position}"
+
+
+# 🔧 Build the pool from PHONE_API_POOL or PHONE_API_KEYS; falls back to one keyless endpoint
+# With slice_count > 1 the pool is one of that many disjoint slices (one per worker process):
+# whole keys are dealt out when there are enough of them, otherwise every key's budget is split.
+# budget_share scales every key's budget, for processes that share all the keys (work_queue workers).
+def load_key_pool(base_url, requests_per_window=REQUESTS_PER_WINDOW, window_seconds=WINDOW_SECONDS,
+                  burst=BURST_SIZE, environ=os.environ, slice_index=0, slice_count=1, bulk_share=None,
+                  budget_share=1.0):
+    pool_file = environ.get(API_POOL_ENV)
+    if pool_file:
+        with open(pool_file, encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        keys = [key.strip() for key in environ.get(API_KEYS_ENV, "").split(",") if key.strip()]
+        entries = [{"key": key} for key in keys] or [{}]
+
+    share = 1
+    if len(entries) >= slice_count:
+        entries = [(position, entry) for position, entry in enumerate(entries, 1)][slice_index::slice_count]
+    else:
+        entries, share = list(enumerate(entries, 1)), slice_count
+
+    # A shared key's budget starts staggered, not full in every process: slice i of n sends its
+    # first request i/n of the way into the key's interval, so together they start at the key's
+    # rate. Queue workers do not know their position and start empty.
+    tokens = None
+    if share > 1:
+        tokens = 1 - slice_index / share
+    elif budget_share < 1:
+        tokens = 0.0
+
+    endpoints = []
+    for position, entry in entries:
+        api_key = entry.get("key")
+        name = entry.get("name") or (key_label(api_key, position) if api_key else "default")
+        budget = TokenBucket(
+            requests_per_window=entry.get("requests_per_window", requests_per_window) * budget_share / share,
+            window_seconds=entry.get("window_seconds", window_seconds),
+            burst=entry.get("burst", burst),
+            tokens=tokens,
+        )
+        endpoints.append(ApiEndpoint(name, entry.get("url", base_url), api_key, budget,
+                                     key_param=entry.get("key_param", KEY_PARAM)))
+    if bulk_share is None:
+        bulk_share = float(environ.get(BULK_SHARE_ENV, 1.0))
+    return KeyPool(endpoints, bulk_share=bulk_share)
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# 🗄️ One cache file shared by the CLI scripts and the GUI (override with PHONE_LOOKUP_CACHE)
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PHONE_LOOKUP_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "lookup_cache.db"),
+)
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600  # 30 days
+DEFAULT_MAX_ENTRIES = 500_000
+
+
+# 🔑 Cache key: the number reduced to "+" and digits, so "+44 20-7946" and "+44207946" share an entry
+def cache_key(phone_number):
+    phone_number = str(phone_number).strip()
+    digits = "".join(ch for ch in phone_number if ch.isdigit())
+    return "+" + digits if phone_number.startswith("+") else digits
+
+
+# ♻️ Cross-run cache of full API responses, keyed by normalized number and requested fields
+# Entries expire after `ttl_seconds`; once the cache holds more than `max_entries`
+# the least recently used entries are evicted.
+class LookupCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " number TEXT NOT NULL, fields TEXT NOT NULL, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (number, fields))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lookups_last_used ON lookups (last_used)")
+        self.conn.commit()
+        self._entries = self.conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+
+    # 🔍 Cached response values for a number, or None on miss/expiry
+    def get(self, phone_number, fields):
+        key = cache_key(phone_number)
+        now = self.clock()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, created_at FROM lookups WHERE number = ? AND fields = ?", (key, fields)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE lookups SET last_used = ? WHERE number = ? AND fields = ?", (now, key, fields)
+                )
+            self.hits += 1
+            return json.loads(row[0])
+
+    # 💾 Store the parsed response values for a number
+    def put(self, phone_number, fields, values):
+        key = cache_key(phone_number)
+        now = self.clock()
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO lookups (number, fields, response, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, fields, json.dumps(list(values)), now, now),
+                )
+                self._entries += 1  # Upper bound (replacements count too), recounted on eviction
+                if self._entries > self.max_entries:
+                    self._evict(now)
+
+    def _evict(self, now):
+        # Drop expired entries first, then the least recently used down to 90% of the bound
+        self.conn.execute("DELETE FROM lookups WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._entries = self.conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+        target = int(self.max_entries * 0.9)
+        if self._entries > target:
+            self.conn.execute(
+                "DELETE FROM lookups WHERE rowid IN (SELECT rowid FROM lookups ORDER BY last_used LIMIT ?)",
+                (self._entries - target,),
+            )
+            self._entries = target
+
+    # 🧾 Hit/miss counts for the end-of-run report
+    def summary(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return f"♻️ Lookup cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
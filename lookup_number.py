@@ -0,0 +1,46 @@
+import argparse
+
+import pandas as pd
+
+from lookup_session import LookupSession, add_lookup_arguments
+from prevalidation import prevalidate_numbers
+from result_schema import EXPECTED_HEADERS
+
+
+# ⚡ Check a few numbers right away: cache first, then the interactive lane of the key pool
+# Returns (number, normalized, reject reason or None, values or None) per number. Runs
+# next to a bulk job without queueing behind it; the bulk job leaves quota free for
+# this when it is started with PHONE_BULK_QUOTA_SHARE below 1.
+def lookup_numbers(numbers, args):
+    checked = prevalidate_numbers(numbers)
+    session = LookupSession(args)
+    answers = []
+    try:
+        for number, normalized, reason in zip(numbers, checked["Normalized"], checked["Reject Reason"]):
+            if not pd.isna(reason):
+                answers.append((number, normalized, reason, None))
+            else:
+                answers.append((number, normalized, None, session.api_client.lookup_now(normalized)))
+    finally:
+        session.close()
+    return answers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up single phone numbers ahead of any bulk job")
+    parser.add_argument("numbers", nargs="+", help="numbers in international format, e.g. +14155550100")
+    add_lookup_arguments(parser, concurrency=False)
+    args = parser.parse_args(argv)
+
+    for number, normalized, reason, values in lookup_numbers(args.numbers, args):
+        print(f"📞 {number}")
+        if reason is not None:
+            print(f"   ❌ Not looked up: {reason}")
+            continue
+        for header, value in zip(EXPECTED_HEADERS, values):
+            print(f"   {header:<22} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
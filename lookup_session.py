@@ -0,0 +1,53 @@
+from key_pool import load_key_pool
+from lookup_cache import LookupCache
+from phone_api import API_BASE_URL, LOOKUP_LIVE, LOOKUP_MODES, MAX_IN_FLIGHT, UNFINISHED_STATUSES, PhoneApiClient
+from rate_limiter import REQUESTS_PER_WINDOW, WINDOW_SECONDS
+from result_schema import EXPECTED_HEADERS, FIELDS
+
+
+# 🎛️ Lookup options shared by the command-line runners: mode, rate budget and concurrency
+def add_lookup_arguments(parser, modes=LOOKUP_MODES, budget_help="budget per API key", max_in_flight_help=None,
+                         concurrency=True):
+    parser.add_argument("--mode", choices=modes, default=LOOKUP_LIVE)
+    parser.add_argument("--requests-per-window", type=float, default=REQUESTS_PER_WINDOW, help=budget_help)
+    parser.add_argument("--window-seconds", type=float, default=WINDOW_SECONDS)
+    if concurrency:
+        parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help=max_in_flight_help)
+
+
+# 📡 Key pool, lookup cache and API client of one run, built from those options and closed together
+# Extra keyword arguments go to load_key_pool (budget slices, budget_share); cache=False runs without
+# the lookup cache.
+class LookupSession:
+    def __init__(self, args, cache=True, **pool_options):
+        self.key_pool = load_key_pool(API_BASE_URL, args.requests_per_window, args.window_seconds, burst=1,
+                                      **pool_options)
+        self.lookup_cache = LookupCache() if cache else None
+        self.api_client = PhoneApiClient(FIELDS, EXPECTED_HEADERS, self.key_pool, self.lookup_cache,
+                                         max_in_flight=getattr(args, "max_in_flight", MAX_IN_FLIGHT), mode=args.mode)
+        self.failed = 0
+
+    @property
+    def api_calls(self):
+        return self.api_client.api_calls
+
+    # (phone_number, values) of the answers worth storing; the others are only counted in `failed`
+    # (they stay unprocessed, so the next run asks again)
+    def lookup_many(self, phone_numbers, should_stop=None):
+        for phone_number, values in self.api_client.lookup_many(phone_numbers, should_stop=should_stop):
+            if values[0] in UNFINISHED_STATUSES:
+                self.failed += 1
+                continue
+            yield phone_number, values
+
+    # 🧾 Key usage and cache hit rate, for the end-of-run report
+    def summary(self):
+        lines = [self.key_pool.summary()]
+        if self.lookup_cache is not None:
+            lines.append(self.lookup_cache.summary())
+        return "\n".join(lines)
+
+    def close(self):
+        self.api_client.close()
+        if self.lookup_cache is not None:
+            self.lookup_cache.close()
@@ -0,0 +1,285 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 📊 Histogram buckets in seconds (upper bounds, Prometheus style; +Inf is implicit)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PREFIX = "phone_validator"
+
+# ⏱️ Stages of the hot path, in pipeline order
+STAGE_INPUT = "input_read"
+STAGE_NORMALIZE = "normalize"
+STAGE_CACHE = "cache_lookup"
+STAGE_CIRCUIT = "circuit_wait"
+STAGE_RATE_LIMIT = "rate_limit_wait"
+STAGE_HTTP = "http"
+STAGE_PARSE = "parse"
+STAGE_WRITER_WAIT = "writer_wait"  # Producer blocked because the writer queue was full
+STAGE_PERSIST = "persist"
+STAGE_EXPORT = "export"
+STAGES = (STAGE_INPUT, STAGE_NORMALIZE, STAGE_CACHE, STAGE_CIRCUIT, STAGE_RATE_LIMIT, STAGE_HTTP, STAGE_PARSE,
+          STAGE_WRITER_WAIT, STAGE_PERSIST, STAGE_EXPORT)
+
+# 🔧 Opt-in outputs, read by start_from_env()
+METRICS_PORT_ENV = "PHONE_METRICS_PORT"  # Serve /metrics on this port
+METRICS_FILE_ENV = "PHONE_METRICS_FILE"  # Rewrite this file (node_exporter textfile format)
+ROW_LOG_ENV = "PHONE_ROW_LOG"            # Append per-row JSON lines here
+METRICS_FILE_INTERVAL = 10               # Seconds between metrics file rewrites
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+# 📈 One latency histogram (bucket counts, sum, count)
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    # Upper bound of the bucket holding the q-th quantile (coarse, but free to compute)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        target, running = q * self.count, 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+
+# 🗃️ Process-wide counters and stage histograms
+# Observing is one lock and a few additions, cheap enough to leave on everywhere.
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    # 📦 Plain copy of what was recorded, to hand to another process (reset=True starts over after it)
+    def snapshot(self, reset=False):
+        with self.lock:
+            data = {
+                "counters": dict(self.counters),
+                "histograms": {stage: (list(h.counts), h.sum, h.count) for stage, h in self.histograms.items()},
+            }
+            if reset:
+                self.counters.clear()
+                self.histograms.clear()
+        return data
+
+    # ➕ Add a snapshot taken in another process (e.g. a worker's) to this registry
+    def merge(self, data):
+        with self.lock:
+            for key, value in data["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for stage, (counts, total, calls) in data["histograms"].items():
+                histogram = self.histograms.get(stage)
+                if histogram is None:
+                    histogram = self.histograms[stage] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += calls
+
+    # 🧾 Rows for tables: one per stage, in pipeline order
+    def stage_rows(self):
+        with self.lock:
+            stages = sorted(self.histograms, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+            return [
+                {
+                    "Stage": stage,
+                    "Calls": h.count,
+                    "Total s": round(h.sum, 3),
+                    "Mean ms": round(h.sum / h.count * 1000, 3) if h.count else None,
+                    "p50 ≤ ms": h.quantile(0.5) * 1000,
+                    "p99 ≤ ms": h.quantile(0.99) * 1000,
+                }
+                for stage, h in ((s, self.histograms[s]) for s in stages)
+            ]
+
+    def counter_rows(self):
+        with self.lock:
+            return [
+                {"Counter": name + _label_text(labels), "Value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+
+    # 🖨️ Short end-of-run breakdown of where the wall-clock time went
+    def summary(self):
+        lines = ["⏱️ Time per stage:"]
+        for row in self.stage_rows():
+            lines.append(f"   • {row['Stage']:<16} {row['Total s']:>10.3f} s over {row['Calls']} calls "
+                         f"(mean {row['Mean ms']:.3f} ms)")
+        return "\n".join(lines)
+
+    # 📡 Prometheus text exposition format
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            names = sorted({name for (name, _), _ in counters})
+            for name in names:
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                for (counter, labels), value in counters:
+                    if counter == name:
+                        lines.append(f"{PREFIX}_{name}_total{_label_text(labels)} {value}")
+            if histograms:
+                metric = f"{PREFIX}_stage_seconds"
+                lines.append(f"# HELP {metric} Time spent per pipeline stage")
+                lines.append(f"# TYPE {metric} histogram")
+                for stage, h in histograms:
+                    running = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), h.counts):
+                        running += count
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {running}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+            lines.append(f"{PREFIX}_start_time_seconds {self.started_at}")
+        return "\n".join(lines) + "\n"
+
+    # 💾 Atomic rewrite, so a scraper never reads half a file
+    def write_file(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# The registry every module reports to
+REGISTRY = MetricsRegistry()
+count = REGISTRY.count
+observe = REGISTRY.observe
+timed = REGISTRY.timed
+
+
+# 🌐 GET /metrics for Prometheus
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 🔁 Rewrite the metrics file every `interval` seconds on a daemon thread
+def start_metrics_file(path, interval=METRICS_FILE_INTERVAL, registry=REGISTRY):
+    def loop():
+        while True:
+            time.sleep(interval)
+            registry.write_file(path)
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+# 🔧 Start whichever outputs the environment asks for; returns the metrics file path (or None)
+def start_from_env():
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        start_metrics_server(int(port))
+        print(f"📊 Metrics on http://localhost:{port}/metrics")
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path:
+        start_metrics_file(path)
+    return path
+
+
+# 📝 Opt-in per-row log: JSON lines, buffered in memory and written in batches
+# Disabled (every call is a no-op) unless given a path, so the default run pays nothing.
+class RowLog:
+    def __init__(self, path=None, buffer_size=1000, flush_seconds=5.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def log(self, event, **fields):
+        if self.path is None:
+            return
+        fields["event"] = event
+        fields["ts"] = round(time.time(), 3)
+        with self.lock:
+            self.buffer.append(json.dumps(fields, default=str))
+            if len(self.buffer) >= self.buffer_size or time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.path is not None:
+            self.flush()
+
+
+def open_row_log():
+    return RowLog(os.environ.get(ROW_LOG_ENV))
@@ -0,0 +1,28 @@
+import csv
+import functools
+import os
+
+# 📖 Country calling codes, sub-prefixes (NANP area codes, crown dependencies, ...) and
+# national number lengths, one row per prefix
+NUMBERING_PLAN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "numbering_plan.csv")
+
+
+# 📥 Load the numbering plan rows (cached, the file never changes during a run)
+@functools.lru_cache(maxsize=None)
+def load_numbering_plan(path=NUMBERING_PLAN_FILE):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["min_length"] = int(row["min_length"])
+        row["max_length"] = int(row["max_length"])
+    return tuple(rows)
+
+
+# 📏 Shortest/longest national number allowed for each calling code ("44" → (7, 10))
+@functools.lru_cache(maxsize=None)
+def calling_code_lengths(path=NUMBERING_PLAN_FILE):
+    lengths = {}
+    for row in load_numbering_plan(path):
+        low, high = lengths.get(row["calling_code"], (row["min_length"], row["max_length"]))
+        lengths[row["calling_code"]] = (min(low, row["min_length"]), max(high, row["max_length"]))
+    return lengths
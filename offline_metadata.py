@@ -0,0 +1,175 @@
+import bisect
+import csv
+import json
+import mmap
+import os
+import struct
+
+from numbering_plan import NUMBERING_PLAN_FILE, load_numbering_plan
+
+# 📖 Number-type prefixes (mobile, fixed line, toll free, ...) on top of the numbering plan
+NUMBER_TYPES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "number_types.csv")
+# 🗜️ Compiled prefix table, rebuilt automatically when either CSV is newer
+PREFIX_INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "numbering_plan.bin")
+
+# Binary layout: header, per-length record offsets, JSON string table, then fixed-size
+# records sorted by (prefix length, prefix value) so each length is one binary-searchable run.
+MAGIC = b"PNPX"
+VERSION = 1
+MAX_PREFIX_LENGTH = 15
+HEADER = struct.Struct("<4sHI")                       # magic, version, record count
+OFFSETS = struct.Struct(f"<{MAX_PREFIX_LENGTH + 2}I")  # first record per prefix length
+RECORD = struct.Struct("<QHB")                        # prefix value, country index, type index
+NO_COUNTRY = 0xFFFF
+
+OFFLINE_STATUS = "offline"  # Status of numbers the numbering plan accepts (no carrier or disposable data)
+
+# API fields that can be answered from numbering-plan data alone
+OFFLINE_FIELDS = {
+    "numberType", "numberCountryCode", "formatE164", "formatNational", "formatInternational",
+    "continent", "continentCode", "countryName", "country", "currency",
+}
+
+
+# 🛠️ Compile numbering_plan.csv + number_types.csv into the binary prefix table
+def compile_prefix_index(out_path=PREFIX_INDEX_FILE, plan_path=NUMBERING_PLAN_FILE, types_path=NUMBER_TYPES_FILE):
+    countries = []
+    entries = {}  # prefix → [country index, type index]
+    for row in load_numbering_plan(plan_path):
+        entries.setdefault(row["prefix"], [NO_COUNTRY, 0])[0] = len(countries)
+        countries.append([row["calling_code"], row["country"], row["country_name"], row["continent"],
+                          row["continent_code"], row["currency"], row["min_length"], row["max_length"],
+                          row["trunk_prefix"]])
+
+    types = [""]
+    with open(types_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["number_type"] not in types:
+                types.append(row["number_type"])
+            entries.setdefault(row["prefix"], [NO_COUNTRY, 0])[1] = types.index(row["number_type"])
+
+    ordered = sorted(entries.items(), key=lambda item: (len(item[0]), int(item[0])))
+    offsets = [0] * (MAX_PREFIX_LENGTH + 2)
+    for length in range(MAX_PREFIX_LENGTH + 2):
+        offsets[length] = sum(1 for prefix, _ in ordered if len(prefix) < length)
+
+    strings = json.dumps({"countries": countries, "types": types}).encode("utf-8")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ordered)))
+        f.write(OFFSETS.pack(*offsets))
+        f.write(struct.pack("<I", len(strings)))
+        f.write(strings)
+        for prefix, (country, number_type) in ordered:
+            f.write(RECORD.pack(int(prefix), country, number_type))
+    os.replace(tmp_path, out_path)
+    return len(ordered)
+
+
+def _is_stale(index_path, sources):
+    if not os.path.exists(index_path):
+        return True
+    built = os.path.getmtime(index_path)
+    return any(os.path.getmtime(source) > built for source in sources)
+
+
+# 🔎 Longest-prefix lookups over the memory-mapped table
+class PrefixIndex:
+    def __init__(self, path=PREFIX_INDEX_FILE):
+        if path == PREFIX_INDEX_FILE and _is_stale(path, (NUMBERING_PLAN_FILE, NUMBER_TYPES_FILE)):
+            compile_prefix_index(path)
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a compiled prefix index (version {VERSION})")
+        self.offsets = OFFSETS.unpack_from(self.data, HEADER.size)
+        position = HEADER.size + OFFSETS.size
+        (strings_size,) = struct.unpack_from("<I", self.data, position)
+        strings = json.loads(self.data[position + 4:position + 4 + strings_size].decode("utf-8"))
+        self.countries = strings["countries"]
+        self.types = strings["types"]
+        self.records_start = position + 4 + strings_size
+        self._keys = _RecordKeys(self)
+
+    def _record(self, i):
+        return RECORD.unpack_from(self.data, self.records_start + i * RECORD.size)
+
+    # Country row and number type for a string of digits (no "+"), None when unknown
+    def match(self, digits):
+        country, number_type = None, None
+        for length in range(min(len(digits), MAX_PREFIX_LENGTH), 0, -1):
+            lo, hi = self.offsets[length], self.offsets[length + 1]
+            if lo == hi:
+                continue
+            value = int(digits[:length])
+            i = bisect.bisect_left(self._keys, value, lo, hi)
+            if i < hi and self._keys[i] == value:
+                _, country_index, type_index = self._record(i)
+                if country is None and country_index != NO_COUNTRY:
+                    country = self.countries[country_index]
+                if number_type is None and type_index:
+                    number_type = self.types[type_index]
+                if country is not None and number_type is not None:
+                    break
+        return country, number_type
+
+    def close(self):
+        self.data.close()
+
+
+# Sequence view of record prefix values so bisect can search the mmap directly
+class _RecordKeys:
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, i):
+        return self.index._record(i)[0]
+
+
+# 📴 Offline answers for the numbering-plan fields of phone-number-api.com
+class OfflineMetadata:
+    def __init__(self, index=None):
+        self.index = index or PrefixIndex()
+
+    # All derivable fields for one number, keyed by API field name
+    def lookup(self, phone_number):
+        digits = "".join(ch for ch in str(phone_number) if ch.isdigit())
+        country, number_type = self.index.match(digits)
+        result = {"query": phone_number}
+        if country is None:
+            result.update(status="fail", message="unknown country calling code")
+            return result
+
+        calling_code, iso, name, continent, continent_code, currency, min_length, max_length, trunk = country
+        national = digits[len(calling_code):]
+        valid = "true" if min_length <= len(national) <= max_length else "false"
+        result.update(
+            status=OFFLINE_STATUS if valid == "true" else "fail",
+            numberType=number_type or "UNKNOWN",
+            numberValid=valid,
+            numberValidForRegion=valid,
+            numberCountryCode=calling_code,
+            formatE164="+" + digits,
+            formatNational=trunk + national,
+            formatInternational=f"+{calling_code} {national}",
+            continent=continent,
+            continentCode=continent_code,
+            countryName=name,
+            country=iso,
+            currency=currency,
+        )
+        return result
+
+    # 🧾 Row in the same order as a FIELDS string (and therefore EXPECTED_HEADERS)
+    def values(self, phone_number, fields):
+        result = self.lookup(phone_number)
+        return [result.get(field, "N/A") for field in fields.split(",")]
+
+
+if __name__ == "__main__":
+    records = compile_prefix_index()
+    print(f"✅ Compiled {records} prefixes into '{PREFIX_INDEX_FILE}' ({os.path.getsize(PREFIX_INDEX_FILE)} bytes)")
@@ -0,0 +1,293 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from coalescing import SHARED_INFLIGHT
+from key_pool import (DISABLING_STATUSES, LANE_BULK, LANE_INTERACTIVE, OUTCOME_ERROR, OUTCOME_FAILED, OUTCOME_OK,
+                      OUTCOME_THROTTLED, ApiEndpoint, KeyPool)
+from lookup_cache import cache_key
+from offline_metadata import OFFLINE_FIELDS, OfflineMetadata
+from response_parser import MALFORMED_RESPONSE, ResponseParser
+from retry_queue import RetryQueue, is_transient_status
+
+# 🌐 API Details
+API_BASE_URL = os.environ.get("PHONE_API_BASE_URL", "http://phone-number-api.com/csv/")  # e.g. api_stub.py
+REQUEST_TIMEOUT = 10
+MAX_IN_FLIGHT = 1  # Free plan: one request at a time is plenty for 5/min
+RUN_ANSWERS = 100_000  # Answers lookup_many keeps for repeats later in the input (most recent numbers)
+
+# 🔀 Lookup modes
+LOOKUP_LIVE = "live"        # Every field from the API
+LOOKUP_OFFLINE = "offline"  # Numbering-plan fields only, no API calls at all
+LOOKUP_HYBRID = "hybrid"    # Numbering-plan fields offline, the rest (carrier, disposable, ...) live
+LOOKUP_MODES = (LOOKUP_LIVE, LOOKUP_HYBRID, LOOKUP_OFFLINE)
+
+# 🧱 Failure rows
+REQUEST_FAILED = "REQUEST_FAILED"  # Transient (timeout, 429, 5xx) and out of retries: do not store, retry next run
+API_ERROR = "API_ERROR"            # The API answered with a final error: safe to mark as processed
+UNFINISHED_STATUSES = (REQUEST_FAILED, MALFORMED_RESPONSE)  # No usable answer: never stored, looked up again next run
+
+
+# 🔌 Session with a keep-alive connection pool sized for the number of workers
+def create_session(pool_size=MAX_IN_FLIGHT):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# 🧱 Placeholder row for numbers the API could not answer
+def error_row(status, phone_number, headers):
+    return [status] + ["N/A"] * (len(headers) - 2) + [phone_number]
+
+
+_END = object()  # End-of-input marker for lookup_many
+_RETRYING = object()  # lookup_many: the number's retry is queued
+
+
+def _answered(values):
+    future = Future()
+    future.set_result(values)
+    return future
+
+
+# ⏸️ A failure worth retrying later (raised by the client, handled by lookup_many)
+class TransientLookupError(Exception):
+    def __init__(self, phone_number, reason):
+        super().__init__(reason)
+        self.phone_number = phone_number
+
+
+# 📡 Client for phone-number-api.com
+# All workers share one pooled session, one rate budget and (optionally) the
+# lookup cache, so raising max_in_flight never exceeds the global rate budget.
+# The budget is a TokenBucket for the single default endpoint, or a KeyPool that
+# spreads requests over several keys, each with its own budget and breaker.
+# Transient failures are retried later from a backoff queue, and a circuit breaker
+# pauses all requests while the provider keeps failing. Identical lookups in flight
+# at the same time (duplicate rows, or another session's job) share one request.
+class PhoneApiClient:
+    def __init__(self, fields, headers, budget, lookup_cache=None,
+                 max_in_flight=MAX_IN_FLIGHT, base_url=API_BASE_URL, timeout=REQUEST_TIMEOUT,
+                 mode=LOOKUP_LIVE, offline=None, retry_queue=None, circuit_breaker=None, sleep=time.sleep,
+                 inflight=None):
+        if mode not in LOOKUP_MODES:
+            raise ValueError(f"Unknown lookup mode '{mode}', expected one of {LOOKUP_MODES}")
+        self.fields = fields
+        self.field_list = fields.split(",")
+        self.headers = list(headers)
+        self.mode = mode
+        self.offline = offline or (OfflineMetadata() if mode != LOOKUP_LIVE else None)
+        # Hybrid mode asks the API only for what the numbering plan cannot answer
+        if mode == LOOKUP_HYBRID:
+            self.live_fields = ",".join(f for f in self.field_list if f not in OFFLINE_FIELDS)
+        else:
+            self.live_fields = fields
+        if isinstance(budget, KeyPool):
+            self.pool = budget
+        else:
+            self.pool = KeyPool([ApiEndpoint("default", base_url, rate_limiter=budget, circuit_breaker=circuit_breaker)])
+        self.lookup_cache = lookup_cache
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.session = create_session(self.max_in_flight)
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue()
+        self.sleep = sleep
+        self.inflight = inflight if inflight is not None else SHARED_INFLIGHT
+        self.parsers = {field_set: ResponseParser(field_set) for field_set in {self.fields, self.live_fields}}
+        self.lock = threading.Lock()
+        self.api_calls = 0
+
+    # 🔍 Look up one number according to the client's mode (raises TransientLookupError)
+    def lookup(self, phone_number, lane=LANE_BULK):
+        if self.mode == LOOKUP_OFFLINE:
+            metrics.count("lookups", source="offline")
+            return self.offline.values(phone_number, self.fields)
+
+        if self.mode == LOOKUP_HYBRID:
+            result = self.offline.lookup(phone_number)
+            if result["status"] != "fail":  # Numbers the numbering plan rejects never cost a call
+                live_values = self._live_lookup(phone_number, self.live_fields, lane)
+                result.update(zip(self.live_fields.split(","), live_values))
+            else:
+                metrics.count("lookups", source="offline")
+            return [result.get(field, "N/A") for field in self.field_list]
+
+        return self._live_lookup(phone_number, self.fields, lane)
+
+    # ⚡ One number for someone waiting on it: cache first, then the next free slot ahead of bulk lookups
+    # No retry queue here; a transient failure comes back as a REQUEST_FAILED row right away.
+    def lookup_now(self, phone_number):
+        try:
+            return self.lookup(phone_number, lane=LANE_INTERACTIVE)
+        except TransientLookupError as e:
+            print(f"⚠️ {e} for {phone_number}")
+            return error_row(REQUEST_FAILED, phone_number, self.field_list)
+
+    # 📡 Cache first, then the API (joining an identical request already in flight), for the given field list
+    def _live_lookup(self, phone_number, fields, lane=LANE_BULK):
+        if self.lookup_cache is not None:
+            with metrics.timed(metrics.STAGE_CACHE):
+                cached = self.lookup_cache.get(phone_number, fields)
+            if cached is not None:
+                metrics.count("lookups", source="cache")
+                return cached
+
+        key = (fields, cache_key(phone_number))
+        return list(self.inflight.run(key, lambda: self._fetch(phone_number, fields, lane)))
+
+    # 🌐 One API request; the leader of a coalesced lookup runs this, everyone else waits for it
+    def _fetch(self, phone_number, fields, lane=LANE_BULK):
+        field_list = fields.split(",")
+        # The pool skips keys with an open circuit before taking a token, so a dead provider costs no budget
+        endpoint, circuit_wait, rate_wait = self.pool.acquire(lane)
+        metrics.observe(metrics.STAGE_CIRCUIT, circuit_wait)
+        metrics.observe(metrics.STAGE_RATE_LIMIT, rate_wait)
+        breaker = endpoint.circuit_breaker
+        with self.lock:
+            self.api_calls += 1
+        try:
+            with metrics.timed(metrics.STAGE_HTTP):
+                response = self.session.get(
+                    endpoint.base_url, params=endpoint.params(phone_number, fields), timeout=self.timeout
+                )
+            endpoint.rate_limiter.update_from_response(response)
+        except requests.exceptions.RequestException as e:
+            metrics.count("lookups", source="api", outcome="request_failed")
+            endpoint.record(OUTCOME_FAILED)
+            breaker.record_failure()
+            raise TransientLookupError(phone_number, f"request failed ({type(e).__name__})")
+
+        if response.status_code != 200:
+            metrics.count("lookups", source="api", outcome=f"http_{response.status_code}")
+            if response.status_code == 429:
+                endpoint.record(OUTCOME_THROTTLED)
+                breaker.release_trial()
+                raise TransientLookupError(phone_number, "HTTP 429")  # The key's budget already backs off
+            if endpoint.api_key and response.status_code in DISABLING_STATUSES:
+                # The key is the problem, not the number: drop it and let the retry use another one
+                endpoint.record(OUTCOME_FAILED)
+                breaker.release_trial()
+                self.pool.disable(endpoint, f"HTTP {response.status_code}")
+                raise TransientLookupError(phone_number, f"HTTP {response.status_code} from {endpoint.name}")
+            if is_transient_status(response.status_code):
+                endpoint.record(OUTCOME_FAILED)
+                breaker.record_failure()
+                raise TransientLookupError(phone_number, f"HTTP {response.status_code}")
+            endpoint.record(OUTCOME_ERROR)
+            breaker.record_success()
+            print(f"❌ API Error: {response.status_code} for {phone_number}")
+            return error_row(API_ERROR, phone_number, field_list)
+
+        endpoint.record(OUTCOME_OK)
+        breaker.record_success()
+        metrics.count("lookups", source="api", outcome="ok")
+        with metrics.timed(metrics.STAGE_PARSE):
+            parsed, problem = self.parsers[fields].parse(response.content)
+        if parsed is None:
+            # Tagged for the caller like a failed request: never cached or stored, so a later run asks again
+            metrics.count("malformed_responses")
+            print(f"⚠️ Malformed response for {phone_number}: {problem}")
+            return error_row(MALFORMED_RESPONSE, phone_number, field_list)
+
+        # ✅ Ensure "Query" column is always filled with the original phone number
+        if parsed.get("query") in ("", "N/A"):
+            parsed["query"] = phone_number
+        values = [parsed[field] for field in field_list]
+        if self.lookup_cache is not None:
+            with metrics.timed(metrics.STAGE_CACHE):
+                self.lookup_cache.put(phone_number, fields, values)
+        return values
+
+    # 🔄 Look up many numbers with up to max_in_flight concurrent requests
+    # Yields (phone_number, values) in input order, except that a number hitting a transient
+    # failure comes back later, after its retry. The input is consumed lazily, so only a
+    # small window of futures (plus the retry queue) is ever in flight. A number is looked up
+    # once per run: a repeat joins the attempt in flight, waits for a queued retry, or gets the
+    # answer already given (kept for the last RUN_ANSWERS numbers), and is yielded for every
+    # occurrence. Once should_stop() is true no new lookups start and pending retries are dropped.
+    def lookup_many(self, phone_numbers, should_stop=None):
+        source = iter(phone_numbers)
+        exhausted = False
+        window = 1 if self.max_in_flight == 1 else self.max_in_flight * 2
+        pending = collections.deque()  # (phone_number, attempt, future); attempt is None for a repeat
+        running = {}  # phone_number -> future of its current attempt, or _RETRYING
+        waiting = collections.Counter()  # Repeats of numbers with a queued retry, yielded with its answer
+        answers = collections.OrderedDict()  # phone_number -> final values
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            while True:
+                stopping = should_stop is not None and should_stop()
+                while len(pending) < window and not stopping:
+                    item = self.retry_queue.pop_due()
+                    if item is None and not exhausted:
+                        phone_number = next(source, _END)
+                        if phone_number is _END:
+                            exhausted = True
+                        else:
+                            item = (phone_number, 1)
+                    if item is None:
+                        break
+                    phone_number, attempt = item
+                    future = running.get(phone_number)
+                    if attempt > 1 or (future is None and phone_number not in answers):
+                        future = running[phone_number] = executor.submit(self.lookup, phone_number)
+                    else:
+                        metrics.count("lookups_coalesced")
+                        if future is _RETRYING:
+                            waiting[phone_number] += 1
+                            continue
+                        if future is None:
+                            answers.move_to_end(phone_number)
+                            future = _answered(answers[phone_number])
+                        attempt = None
+                    pending.append((phone_number, attempt, future))
+
+                if pending:
+                    phone_number, attempt, future = pending.popleft()
+                    if attempt is None:
+                        # The attempt it joined was settled first: on a failure its retry (or final row) decides
+                        try:
+                            values = future.result()
+                        except TransientLookupError:
+                            values = answers.get(phone_number)
+                        if values is None:
+                            waiting[phone_number] += 1
+                        else:
+                            yield phone_number, values
+                        continue
+                    values = self._settle(phone_number, attempt, future)
+                    if values is None:
+                        running[phone_number] = _RETRYING
+                        continue
+                    del running[phone_number]
+                    answers[phone_number] = values
+                    if len(answers) > RUN_ANSWERS:
+                        answers.popitem(last=False)
+                    for _ in range(1 + waiting.pop(phone_number, 0)):
+                        yield phone_number, values
+                elif stopping or not len(self.retry_queue):
+                    return
+                else:
+                    self.sleep(self.retry_queue.seconds_until_next())  # Only retries left, none due yet
+
+    # ✅ Result of one attempt, or None when it was queued for a retry
+    def _settle(self, phone_number, attempt, future):
+        try:
+            return future.result()
+        except TransientLookupError as e:
+            if attempt < self.retry_queue.max_attempts:
+                delay = self.retry_queue.push(phone_number, attempt + 1)
+                print(f"🔁 {e} for {phone_number}, retry {attempt}/{self.retry_queue.max_attempts - 1} in {delay:.0f}s")
+                return None
+            print(f"⚠️ Giving up on {phone_number} after {attempt} attempts ({e}), it will be retried next run")
+            return error_row(REQUEST_FAILED, phone_number, self.field_list)
+
+    def close(self):
+        self.session.close()
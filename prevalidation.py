@@ -0,0 +1,67 @@
+import pandas as pd
+
+import metrics
+from numbering_plan import calling_code_lengths
+
+# 🚫 Reasons a number is dropped before it reaches the API
+REJECT_EMPTY = "empty"
+REJECT_MISSING_PLUS = "missing_plus"
+REJECT_INVALID_CHARACTERS = "invalid_characters"
+REJECT_IMPOSSIBLE_LENGTH = "impossible_length"
+REJECT_UNKNOWN_COUNTRY_CODE = "unknown_country_code"
+INVALID_FORMAT = "INVALID_FORMAT"  # Status of the rows the GUI stores for rejected (non-empty) input
+
+# E.164 allows at most 15 digits; the shortest numbers in use have 7
+E164_MIN_DIGITS = 7
+E164_MAX_DIGITS = 15
+
+
+# 🧹 Normalize and pre-validate a whole Phone_Number column with pandas string ops
+# Returns a DataFrame aligned with the input: "Normalized" (e.g. "+442079460000"),
+# "Calling Code" and "Reject Reason" (<NA> for numbers worth an API call).
+@metrics.timed(metrics.STAGE_NORMALIZE)
+def prevalidate_numbers(phone_numbers):
+    raw = pd.Series(phone_numbers).astype("string")
+    normalized = raw.str.strip().str.replace(r"[\s\-().]", "", regex=True)
+    normalized = normalized.str.replace(r"^00", "+", regex=True)  # International prefix 00 → +
+    digits = normalized.str[1:]
+
+    empty = (normalized.isna() | (normalized == "")).fillna(True)
+    missing_plus = ~empty & ~normalized.str.startswith("+").fillna(False)
+    invalid_characters = ~empty & ~missing_plus & ~digits.str.fullmatch(r"\d+").fillna(False)
+    digit_count = digits.str.len()
+    impossible_length = ((digit_count < E164_MIN_DIGITS) | (digit_count > E164_MAX_DIGITS)).fillna(False)
+
+    # Calling codes are prefix-free, so at most one of the 1/2/3-digit heads can match
+    lengths = calling_code_lengths()
+    calling_code = pd.Series(pd.NA, index=raw.index, dtype="string")
+    for width in (1, 2, 3):
+        codes = [code for code in lengths if len(code) == width]
+        head = digits.str[:width]
+        calling_code = calling_code.mask(calling_code.isna() & head.isin(codes).fillna(False), head)
+    unknown_code = calling_code.isna()
+
+    national_length = digit_count - calling_code.str.len()
+    min_length = calling_code.map({code: low for code, (low, _) in lengths.items()}).astype("Int64")
+    max_length = calling_code.map({code: high for code, (_, high) in lengths.items()}).astype("Int64")
+    impossible_length |= ((national_length < min_length) | (national_length > max_length)).fillna(False)
+
+    # Most basic problem wins when several apply
+    reason = pd.Series(pd.NA, index=raw.index, dtype="string")
+    reason = reason.mask(unknown_code, REJECT_UNKNOWN_COUNTRY_CODE)
+    reason = reason.mask(impossible_length, REJECT_IMPOSSIBLE_LENGTH)
+    reason = reason.mask(invalid_characters, REJECT_INVALID_CHARACTERS)
+    reason = reason.mask(missing_plus, REJECT_MISSING_PLUS)
+    reason = reason.mask(empty, REJECT_EMPTY)
+
+    return pd.DataFrame({
+        "Phone_Number": raw,
+        "Normalized": normalized,
+        "Calling Code": calling_code.where(reason.isna()),
+        "Reject Reason": reason,
+    })
+
+
+# 🧾 How many rows were dropped, per reason
+def rejection_summary(checked):
+    return checked["Reject Reason"].value_counts()
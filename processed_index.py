@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+MERGE_THRESHOLD = 100_000    # New numbers kept in the append log before merging into the sorted array
+BLOOM_BITS_PER_ENTRY = 10    # ~1% false positives with 7 hashes
+BLOOM_HASHES = 7
+BLOOM_MIN_BITS = 1 << 23     # 1 MB, so small indexes don't need a rebuild for a while
+MAX_DIGITS = 18              # Fits in int64 (E.164 numbers have at most 15)
+
+
+# 🔢 Phone numbers as int64 E.164 digits ("+44 7911-123456" → 447911123456), -1 when not a number
+def numbers_to_ints(phone_numbers):
+    digits = pd.Series(list(phone_numbers), dtype="string").str.replace(r"\D", "", regex=True)
+    usable = (digits.str.len() > 0) & (digits.str.len() <= MAX_DIGITS)
+    digits = digits.where(usable.fillna(False), "-1")
+    return digits.astype("int64").to_numpy()
+
+
+# 🌸 Bloom filter over int64 values, so most "not processed yet" answers never touch the array
+class BloomFilter:
+    def __init__(self, bits):
+        self.size = (int(bits) + 7) // 8 * 8  # Whole bytes, so the size survives a save/load round trip
+        self.bits = np.zeros(self.size // 8, dtype=np.uint8)
+
+    def _positions(self, values):
+        values = np.asarray(values, dtype=np.int64).astype(np.uint64)
+        h1 = values * np.uint64(0x9E3779B97F4A7C15)
+        h2 = (values ^ (values >> np.uint64(29))) * np.uint64(0xBF58476D1CE4E5B9) | np.uint64(1)
+        steps = np.arange(BLOOM_HASHES, dtype=np.uint64)[:, None]
+        return (h1[None, :] + steps * h2[None, :]) % np.uint64(self.size)
+
+    def add(self, values):
+        positions = self._positions(values).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+    def might_contain(self, values):
+        positions = self._positions(values)
+        hits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return hits.all(axis=0)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        bloom = cls.__new__(cls)
+        bloom.bits = np.load(path)
+        bloom.size = len(bloom.bits) * 8
+        return bloom
+
+
+# 🗂️ On-disk index of processed numbers for O(1)-ish resume checks
+# Files next to the result store (output.db → output.idx.*):
+#   .npy   sorted int64 array, memory-mapped and binary-searched
+#   .log   raw int64 append log of numbers added since the last merge
+#   .bloom Bloom filter over the sorted array (log entries are re-added on open)
+#   .json  id of the last store row the index has seen, so catching up only reads new rows
+class ProcessedIndex:
+    def __init__(self, prefix):
+        self.sorted_path = prefix + ".npy"
+        self.log_path = prefix + ".log"
+        self.bloom_path = prefix + ".bloom"
+        self.meta_path = prefix + ".json"
+        self.lock = threading.RLock()
+
+        self.sorted = np.load(self.sorted_path, mmap_mode="r") if os.path.exists(self.sorted_path) \
+            else np.empty(0, dtype=np.int64)
+        tail = np.fromfile(self.log_path, dtype="<i8") if os.path.exists(self.log_path) else np.empty(0, dtype=np.int64)
+        self.tail = set()
+        if len(tail):
+            tail = np.unique(tail)
+            tail = tail[~self._contains_ints(tail)]  # A merge interrupted before truncating the log
+        self.tail = set(tail.tolist())
+        if os.path.exists(self.bloom_path):
+            self.bloom = BloomFilter.load(self.bloom_path)
+            if len(tail):
+                self.bloom.add(tail)
+        else:
+            self._rebuild_bloom()
+        self.last_id = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.last_id = json.load(f)["last_id"]
+        self.log = open(self.log_path, "ab")
+
+    def __len__(self):
+        return len(self.sorted) + len(self.tail)
+
+    def __contains__(self, phone_number):
+        return bool(self.contains_many([phone_number])[0])
+
+    # ✅ Vectorized membership test for a batch of numbers
+    def contains_many(self, phone_numbers):
+        values = numbers_to_ints(phone_numbers)
+        found = np.zeros(len(values), dtype=bool)
+        if not len(values):
+            return found
+        with self.lock:
+            candidates = values >= 0
+            candidates &= self.bloom.might_contain(values)
+            if not candidates.any():
+                return found
+            checked = values[candidates]
+            in_tail = np.fromiter((v in self.tail for v in checked.tolist()), dtype=bool, count=len(checked))
+            if len(self.sorted):
+                positions = np.searchsorted(self.sorted, checked)
+                positions = np.minimum(positions, len(self.sorted) - 1)
+                in_tail |= np.asarray(self.sorted[positions]) == checked
+            found[candidates] = in_tail
+        return found
+
+    # ➕ Record newly saved numbers (and the store row id they reach)
+    def add(self, phone_numbers, last_id=None):
+        values = numbers_to_ints(phone_numbers)
+        with self.lock:
+            values = np.unique(values[values >= 0])
+            if len(values):
+                values = values[~self._contains_ints(values)]
+            if len(values):
+                self.bloom.add(values)
+                self.log.write(values.astype("<i8").tobytes())
+                self.log.flush()
+                self.tail.update(values.tolist())
+            if last_id is not None and last_id > self.last_id:
+                self.last_id = last_id
+                self._save_meta()
+            if len(self.tail) >= MERGE_THRESHOLD:
+                self.merge()
+
+    def _contains_ints(self, values):
+        found = np.fromiter((v in self.tail for v in values.tolist()), dtype=bool, count=len(values))
+        if len(self.sorted):
+            positions = np.minimum(np.searchsorted(self.sorted, values), len(self.sorted) - 1)
+            found |= np.asarray(self.sorted[positions]) == values
+        return found
+
+    # 🔀 Fold the append log into the sorted array and resize the Bloom filter
+    def merge(self):
+        with self.lock:
+            if not self.tail:
+                return
+            tail = np.fromiter(self.tail, dtype=np.int64, count=len(self.tail))
+            merged = np.union1d(np.asarray(self.sorted), tail)
+            tmp_path = self.sorted_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            self.sorted = None  # Release the old mapping before replacing the file
+            os.replace(tmp_path, self.sorted_path)
+            self.sorted = np.load(self.sorted_path, mmap_mode="r")
+            self.log.close()
+            self.log = open(self.log_path, "wb")
+            self.tail = set()
+            self._rebuild_bloom()
+            self._save_meta()
+
+    def _rebuild_bloom(self):
+        values = np.concatenate([np.asarray(self.sorted), np.fromiter(self.tail, dtype=np.int64, count=len(self.tail))])
+        self.bloom = BloomFilter(max(BLOOM_MIN_BITS, 2 * len(values) * BLOOM_BITS_PER_ENTRY))
+        if len(values):
+            self.bloom.add(values)
+        self.bloom.save(self.bloom_path)
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_id": self.last_id, "count": len(self)}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def close(self):
+        with self.lock:
+            self.log.close()
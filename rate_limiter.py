@@ -0,0 +1,92 @@
+import threading
+import time
+
+# ⏳ Default budget of the free phone-number-api.com plan (5 requests per minute)
+REQUESTS_PER_WINDOW = 5
+WINDOW_SECONDS = 60
+BURST_SIZE = 1
+
+
+# 🪣 Token bucket shared by every entry point
+# Tokens refill continuously, so time already spent on the request itself,
+# parsing and saving counts towards the next slot instead of being added on top.
+# The bucket starts full unless given fewer `tokens` (processes sharing a key start staggered).
+class TokenBucket:
+    def __init__(self, requests_per_window=REQUESTS_PER_WINDOW, window_seconds=WINDOW_SECONDS,
+                 burst=BURST_SIZE, clock=time.monotonic, tokens=None):
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.rate = requests_per_window / window_seconds  # tokens per second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity if tokens is None else min(tokens, self.capacity))
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0      # Provider said the window is exhausted
+        self.server_interval = None   # Spacing that spreads the provider's remaining quota
+        self.server_valid_until = 0.0
+        self.last_acquired = None
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def _wait_time(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        wait = (1 - self.tokens) / self.rate
+        # The provider reported spare quota for its current window: use it
+        if self.server_interval is not None and now < self.server_valid_until and self.last_acquired is not None:
+            wait = min(wait, max(0.0, self.last_acquired + self.server_interval - now))
+        return wait
+
+    # 🎟️ Take a slot if one is free right now (returns 0.0), else return the seconds until one may be
+    # Callers do the waiting (KeyPool.acquire), so one thread can watch every key's bucket at once.
+    def try_acquire(self):
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            wait = self._wait_time(now)
+            if wait <= 0:
+                self.tokens = max(0.0, self.tokens - 1)
+                self.last_acquired = now
+                return 0.0
+            return wait
+
+    # 📬 Sync with the provider's rate-limit headers (X-Rl = remaining, X-Ttl = seconds to reset)
+    def update_from_response(self, response):
+        headers = getattr(response, "headers", None) or {}
+        remaining = _header_int(headers, "X-Rl")
+        ttl = _header_int(headers, "X-Ttl")
+        throttled = getattr(response, "status_code", None) == 429
+
+        with self.lock:
+            now = self.clock()
+            self._refill(now)
+            if throttled or remaining == 0:
+                # Window exhausted: hold every request until the provider resets it
+                reset_in = ttl if ttl is not None else self.window_seconds
+                self.blocked_until = max(self.blocked_until, now + reset_in)
+                self.tokens = 0.0
+                self.server_interval = None
+            elif remaining is not None and ttl is not None:
+                self.server_interval = ttl / remaining
+                self.server_valid_until = now + ttl
+
+    # 🧾 Current budget for logs and run summaries
+    def describe(self):
+        return f"{self.requests_per_window:g} req / {self.window_seconds:g}s (burst {self.capacity})"
+
+
+def _header_int(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+
+import metrics
+from lookup_session import LookupSession, add_lookup_arguments
+from phone_api import LOOKUP_HYBRID, LOOKUP_LIVE
+from result_schema import EXPECTED_HEADERS
+from result_store import ResultWriter, export_outputs, open_result_store, store_path_for
+
+DAY_SECONDS = 24 * 3600
+OLDER_THAN_DAYS = 30   # Results older than this are stale (the lookup cache keeps answers as long)
+DAILY_QUOTA = 1000     # API calls a day's refresh runs may spend together
+REFRESH_MODES = (LOOKUP_LIVE, LOOKUP_HYBRID)  # Offline answers would overwrite live fields with N/A
+
+
+# 🔄 Re-validate the stalest results of an output store, within what is left of today's quota
+# Valid mobile numbers go first, oldest first; fresh answers overwrite the old rows in
+# place. Meant to run from cron: each run picks up where the day's earlier runs stopped.
+def refresh(args):
+    store = open_result_store(args.output, EXPECTED_HEADERS)
+    day = time.strftime("%Y-%m-%d")
+    cutoff = time.time() - args.older_than_days * DAY_SECONDS
+    remaining = args.daily_quota - store.refresh_calls(day)
+    stale = store.stale_count(cutoff)
+    print(f"🕰️ {stale} of {store.count()} results in '{store.path}' are due a refresh "
+          f"(older than {args.older_than_days:g} days)")
+    if not stale or remaining <= 0:
+        if stale:
+            print(f"📅 Today's refresh quota of {args.daily_quota} API calls is used up")
+        store.close()
+        store.index.close()
+        return {"refreshed": 0, "failed": 0, "api_calls": 0}
+
+    row_ids = {}  # number -> ids of its stored rows (older stores may hold a number twice)
+    for row_id, number in store.stale_rows(cutoff, remaining):
+        row_ids.setdefault(number, []).append(row_id)
+    print(f"🔄 Refreshing {len(row_ids)} numbers (up to {remaining} API calls left today)...")
+
+    # No lookup cache: a cached answer is as old as its entry, but would be stamped as validated now.
+    # Failed lookups keep their old answer and stay stale for the next run.
+    session = LookupSession(args, cache=False)
+    writer = ResultWriter(store, save=store.update)
+    try:
+        # Retries count against the quota too, so stop starting lookups once it is spent
+        for phone_number, values in session.lookup_many(row_ids, should_stop=lambda: session.api_calls >= remaining):
+            for row_id in row_ids[phone_number]:
+                writer.put((row_id, values))
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted, saving what was refreshed so far...")
+    finally:
+        writer.close()
+        store.add_refresh_calls(day, session.api_calls)
+        session.close()
+
+    print(f"💾 Refreshed {writer.written} rows in place, {session.failed} numbers left for the next run")
+    print(f"📡 API calls made: {session.api_calls} ({store.refresh_calls(day)} of {args.daily_quota} today)")
+    print(session.summary())
+    if writer.written and args.export:
+        print(f"📤 Exporting {store.count()} results to '{args.output}'...")
+        for path in export_outputs(store, args.output):
+            print(f"   • {path}")
+    store.close()
+    store.index.close()
+    return {"refreshed": writer.written, "failed": session.failed, "api_calls": session.api_calls}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-validate stored results older than a threshold, stalest and most valuable first, "
+                    "within a daily API quota",
+    )
+    parser.add_argument("output", help="output (.xlsx, .csv or .parquet) whose .db store is refreshed")
+    parser.add_argument("--older-than-days", type=float, default=OLDER_THAN_DAYS)
+    parser.add_argument("--daily-quota", type=int, default=DAILY_QUOTA, help="API calls all refresh runs may spend per day")
+    parser.add_argument("--no-export", dest="export", action="store_false", help="only update the .db store")
+    add_lookup_arguments(parser, modes=REFRESH_MODES)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(store_path_for(args.output)) and not os.path.exists(args.output):
+        print(f"❌ Error: No results found for '{args.output}'!")
+        return 1
+    started = time.perf_counter()
+    refresh(args)
+    print(metrics.REGISTRY.summary())
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,46 @@
+import csv
+import io
+
+MALFORMED_RESPONSE = "MALFORMED_RESPONSE"  # Status of rows whose response could not be mapped to the fields
+
+
+# 🧩 Parser for one /csv/ response, bound to the field list that was requested
+# Works on the raw response bytes (no charset sniffing). Plain lines take a
+# str.split fast path; anything with quotes or line breaks goes through the csv
+# module, so a quoted "Carrier, Inc." stays one value. A header line equal to the
+# requested fields is skipped. Values are returned by field name, or None plus a
+# reason when the field count does not match what was asked for.
+class ResponseParser:
+    def __init__(self, fields):
+        self.fields = fields.split(",") if isinstance(fields, str) else list(fields)
+        self.header = ",".join(self.fields)
+
+    def parse(self, content):
+        text = content.decode("utf-8", errors="replace") if isinstance(content, bytes) else content
+        text = text.strip().lstrip("\ufeff")
+        if not text:
+            return None, "empty response"
+
+        if '"' not in text and "\n" not in text:
+            values = text.split(",")
+        else:
+            rows = [row for row in csv.reader(io.StringIO(text)) if row]
+            if len(rows) > 1 and ",".join(rows[0]) == self.header:
+                rows = rows[1:]
+            if len(rows) != 1:
+                return None, f"expected 1 line, got {len(rows)}"
+            values = rows[0]
+
+        if len(values) != len(self.fields):
+            if values[0] == "fail" and len(values) < len(self.fields):
+                return self._short_failure(values), None
+            return None, f"expected {len(self.fields)} fields, got {len(values)}"
+        return dict(zip(self.fields, values)), None
+
+    # A "fail" answer may omit fields; keep the status (and the trailing query) instead of guessing positions
+    def _short_failure(self, values):
+        parsed = dict.fromkeys(self.fields, "N/A")
+        parsed[self.fields[0]] = "fail"
+        if len(values) > 1 and self.fields[-1] == "query":
+            parsed["query"] = values[-1]
+        return parsed
@@ -0,0 +1,70 @@
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Optional: only needed for Parquet output
+    pa = None
+
+# 🌐 Fields requested from the API, and the matching result columns (same order)
+FIELDS = "status,numberType,numberValid,numberValidForRegion,isDisposible,numberCountryCode,numberAreaCode,formatE164,formatNational,formatInternational,carrier,continent,continentCode,countryName,country,region,regionName,city,zip,offset,currency,query"
+
+EXPECTED_HEADERS = [
+    "Status", "Number Type", "Number Valid", "numberValidForRegion", "Is Disposable",
+    "Country Code", "Area Code", "E164 Format", "National Format", "International Format",
+    "Carrier", "Continent", "Continent Code", "Country Name", "Country", "Region",
+    "Region Name", "City", "ZIP", "Offset", "Currency", "Query"
+]
+
+# 🧬 Typed columns of a result row (anything not listed stays text)
+BOOLEAN_COLUMNS = ("Number Valid", "numberValidForRegion", "Is Disposable")
+INTEGER_COLUMNS = ("Offset",)
+CATEGORY_COLUMNS = (
+    "Status", "Number Type", "Country Code", "Continent", "Continent Code", "Country Name", "Country", "Currency",
+)
+MISSING_VALUES = ("", "N/A")  # The API's and error_row's ways of saying "no value"
+TRUE_VALUES = ("true", "1", "yes")
+FALSE_VALUES = ("false", "0", "no")
+
+
+def column_type(column):
+    if column in BOOLEAN_COLUMNS:
+        return "boolean"
+    if column in INTEGER_COLUMNS:
+        return "Int64"
+    if column in CATEGORY_COLUMNS:
+        return "category"
+    return "string"
+
+
+# 🧪 Stored text → typed columns (nullable booleans/ints, categoricals, strings)
+def to_typed_frame(df):
+    typed = {}
+    for column in df.columns:
+        values = df[column].astype("string")
+        values = values.mask(values.isin(MISSING_VALUES))
+        kind = column_type(column)
+        if kind == "boolean":
+            lowered = values.str.strip().str.lower()
+            known = lowered.isin(TRUE_VALUES + FALSE_VALUES)
+            typed[column] = lowered.isin(TRUE_VALUES).astype("boolean").where(known, pd.NA)
+        elif kind == "Int64":
+            numbers = pd.to_numeric(values, errors="coerce")
+            typed[column] = numbers.where(numbers % 1 == 0).astype("Int64")
+        elif kind == "category":
+            typed[column] = values.astype("category")
+        else:
+            typed[column] = values
+    return pd.DataFrame(typed, index=df.index)
+
+
+# 🏹 Arrow schema for Parquet output; fixed up front so every row group matches
+def arrow_schema(headers):
+    if pa is None:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+    types = {
+        "boolean": pa.bool_(),
+        "Int64": pa.int64(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "string": pa.string(),
+    }
+    return pa.schema([(header, types[column_type(header)]) for header in headers])
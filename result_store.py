@@ -0,0 +1,524 @@
+import glob
+import gzip
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import xlsxwriter
+
+import metrics
+from offline_metadata import OFFLINE_STATUS
+from phone_api import API_ERROR, REQUEST_FAILED, UNFINISHED_STATUSES
+from prevalidation import INVALID_FORMAT
+from processed_index import ProcessedIndex
+from result_schema import arrow_schema, to_typed_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Parquet output
+    pa = pq = None
+
+RESULTS_TABLE = "results"
+# Stored rows that do not count as processed: failures kept by older runs, and offline answers,
+# which still lack what only the API knows (carrier, disposable). The next live run asks again
+# and its answer replaces them.
+NOT_INDEXED_STATUSES = UNFINISHED_STATUSES + (OFFLINE_STATUS,)
+LEGACY_RETRY_STATUSES = (REQUEST_FAILED, API_ERROR)  # Old workbooks wrote these for throttled and failed requests too
+INDEXED_COLUMNS = ("Query", "Status", "Country", "Carrier")  # Lookups by number, and the explorer's filters
+LOOKUP_BATCH_SIZE = 500  # Numbers per "Query IN (...)" statement (SQLite caps bound parameters)
+REFRESH_TABLE = "refreshes"  # API calls spent on refreshes, per day
+VALIDATED_AT = "validated_at"  # Store-only column: when the row's lookup was made (epoch seconds, NULL if unknown)
+SYNC_BATCH_SIZE = 100_000  # Store rows read per batch when an index catches up
+EXPORT_CHUNK_SIZE = 100_000  # Rows per streamed export batch (one Parquet row group each)
+EXCEL_MAX_ROWS = 1_048_576   # Per sheet, including the header row
+PARQUET_AVAILABLE = pq is not None
+EXPORT_EXTENSIONS = (".xlsx", ".csv", ".csv.gz", ".parquet")
+DOWNLOAD_CHUNK_SIZE = 10_000  # Rows per batch for cached exports, which may run for several users at once
+GZIP_LEVEL = 6  # Most of level 9's compression at a fraction of the time
+_EXPORT_LOCK = threading.Lock()  # One cached export written at a time per process
+
+# 🧵 Background writer: flush after this many rows or seconds, whichever comes first
+WRITER_FLUSH_ROWS = 500
+WRITER_FLUSH_SECONDS = 2.0
+WRITER_MAX_PENDING = 10_000  # Rows queued before put() blocks (backpressure)
+_CLOSE = object()  # Writer shutdown marker
+
+
+# 📂 Store file that lives next to an output workbook (output.xlsx → output.db)
+def store_path_for(output_file):
+    return os.path.splitext(output_file)[0] + ".db"
+
+
+# 🗂️ Processed-number index files that live next to a store (output.db → output.idx.*)
+def index_prefix_for(store_path):
+    return os.path.splitext(store_path)[0] + ".idx"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Stored "Query" values normalized the same way the loops normalize input
+def _normalize_query(query):
+    return str(query).strip().replace(" ", "").replace("-", "")
+
+
+# Whether a stored row counts as processed: a final answer for an E.164 number ("+…", all the loops look up).
+# Rejected input is stored as typed, and its bare digits would match the real number in the index.
+def _indexable(query, status):
+    return query is not None and _normalize_query(query).startswith("+") and status not in NOT_INDEXED_STATUSES
+
+
+# Rows of a frame with Query and Status columns that count as processed
+def processed_rows(frame):
+    return frame[[_indexable(query, status) for query, status in zip(frame["Query"], frame["Status"])]]
+
+
+# 🏷️ Result-set version: changes whenever rows are appended (new max id) or refreshed (new max timestamp)
+def result_set_version(conn):
+    # Two subqueries, so each MAX is a single index lookup
+    last_id, last_validated = conn.execute(
+        f"SELECT (SELECT MAX(id) FROM {RESULTS_TABLE}), (SELECT MAX({VALIDATED_AT}) FROM {RESULTS_TABLE})"
+    ).fetchone()
+    return f"{last_id or 0}:{last_validated or 0}"
+
+
+# 📎 Export extension of a path; ".csv.gz" counts as one
+def export_extension(file_path):
+    if file_path.lower().endswith(".csv.gz"):
+        return ".csv.gz"
+    return os.path.splitext(file_path)[1].lower()
+
+
+# Typed frame → plain Python cell values (None for missing) for xlsxwriter
+def _cell_rows(frame):
+    return frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+
+
+# 📗 Header row plus the rows of each frame into a one-sheet .xlsx; returns the row count
+# xlsxwriter's constant_memory mode flushes each row to disk as it is written, so
+# memory stays at one frame whatever the size of the workbook.
+def write_excel(file_path, headers, frames, sheet_name="Sheet1"):
+    workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, headers)
+        rows = 0
+        for frame in frames:
+            for values in _cell_rows(frame):
+                rows += 1
+                worksheet.write_row(rows, 0, values)
+    finally:
+        workbook.close()
+    return rows
+
+
+# Rows worth a refresh call: answers for E.164 numbers that count as processed (not rejected input,
+# failures or offline answers, which the next live run looks up anyway)
+REFRESHABLE = (
+    "ltrim(\"Query\") LIKE '+%' AND \"Status\" NOT IN ("
+    + ", ".join(f"'{status}'" for status in NOT_INDEXED_STATUSES + (INVALID_FORMAT,)) + ")"
+)
+# 🥇 Refresh order: valid mobile numbers first (carrier and disposable status matter most
+# there), then other valid numbers, then the rest; oldest first within each tier
+REFRESH_PRIORITY = (
+    "CASE WHEN lower(\"Number Valid\") IN ('true', '1', 'yes')"
+    " THEN (CASE WHEN upper(\"Number Type\") LIKE '%MOBILE%' THEN 0 ELSE 1 END) ELSE 2 END"
+)
+
+
+# 📦 Append-only result store (SQLite in WAL mode)
+# Every append is a single small transaction, so saving costs the same at row
+# 50 and at row 50,000, and a killed process loses at most the batch in flight.
+# The .xlsx is produced once with export_to_excel().
+# When an index is attached, every append also records the saved numbers in it.
+# Each row carries the time of its lookup (validated_at, not exported); refreshes
+# rewrite stale rows in place with update().
+class ResultStore:
+    def __init__(self, path, headers, index=None):
+        self.path = path
+        self.headers = list(headers)
+        self.index = index
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{_quote(h)} TEXT" for h in self.headers)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {RESULTS_TABLE} "
+            f"(id INTEGER PRIMARY KEY AUTOINCREMENT, {columns}, {VALIDATED_AT} REAL)"
+        )
+        # Stores written before rows were timestamped: their rows count as the oldest
+        existing = [row[1] for row in self.conn.execute(f"PRAGMA table_info({RESULTS_TABLE})")]
+        if VALIDATED_AT not in existing:
+            self.conn.execute(f"ALTER TABLE {RESULTS_TABLE} ADD COLUMN {VALIDATED_AT} REAL")
+        self.conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{RESULTS_TABLE}_{VALIDATED_AT} ON {RESULTS_TABLE} ({VALIDATED_AT})"
+        )
+        for column in INDEXED_COLUMNS:
+            if column in self.headers:
+                name = f"idx_{RESULTS_TABLE}_{column.lower()}"
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {RESULTS_TABLE} ({_quote(column)})")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {REFRESH_TABLE} (day TEXT PRIMARY KEY, api_calls INTEGER NOT NULL)")
+        self.conn.commit()
+        self._insert_sql = (
+            f"INSERT INTO {RESULTS_TABLE} ({', '.join(_quote(h) for h in self.headers)}, {VALIDATED_AT}) "
+            f"VALUES ({', '.join('?' for _ in self.headers)}, ?)"
+        )
+        self._update_sql = (
+            f"UPDATE {RESULTS_TABLE} SET {', '.join(f'{_quote(h)} = ?' for h in self.headers)}, {VALIDATED_AT} = ? "
+            f"WHERE id = ?"
+        )
+
+    # 💾 Append rows (lists in `headers` order or a DataFrame with those columns), stamped with the current time
+    def append(self, rows):
+        return self._insert(rows, time.time())
+
+    def _insert(self, rows, validated_at):
+        if isinstance(rows, pd.DataFrame):
+            rows = rows[self.headers].itertuples(index=False, name=None)
+        rows = [(*row, validated_at) for row in rows]
+        if not rows:
+            return 0
+        query = self.headers.index("Query") if "Query" in self.headers else None
+        status = self.headers.index("Status") if "Status" in self.headers else None
+        with self.lock, metrics.timed(metrics.STAGE_PERSIST):
+            with self.conn:
+                if query is not None and status is not None:
+                    self._replace_unfinished([row[query] for row in rows])
+                self.conn.executemany(self._insert_sql, rows)
+                last_id = self.conn.execute(f"SELECT MAX(id) FROM {RESULTS_TABLE}").fetchone()[0]
+            if self.index is not None and query is not None:
+                # Only move the index's high-water mark if it had seen every row before this batch
+                caught_up = self.index.last_id >= last_id - len(rows)
+                self.index.add([row[query] for row in rows
+                                if _indexable(row[query], row[status] if status is not None else None)],
+                               last_id if caught_up else None)
+        metrics.count("rows_persisted", len(rows))
+        return len(rows)
+
+    # 🧽 Drop the stored rows that did not count as processed for numbers about to get a new row
+    def _replace_unfinished(self, queries):
+        queries = list(dict.fromkeys(q for q in queries if q is not None))
+        statuses = ", ".join("?" for _ in NOT_INDEXED_STATUSES)
+        for start in range(0, len(queries), LOOKUP_BATCH_SIZE):
+            batch = queries[start:start + LOOKUP_BATCH_SIZE]
+            self.conn.execute(
+                f'DELETE FROM {RESULTS_TABLE} WHERE "Query" IN ({", ".join("?" for _ in batch)}) '
+                f'AND "Status" IN ({statuses})',
+                batch + list(NOT_INDEXED_STATUSES),
+            )
+
+    # ✏️ Overwrite rows in place with fresh lookups: (id, values in `headers` order) pairs
+    def update(self, rows):
+        now = time.time()
+        rows = [(*values, now, row_id) for row_id, values in rows]
+        if not rows:
+            return 0
+        with self.lock, metrics.timed(metrics.STAGE_PERSIST):
+            with self.conn:
+                self.conn.executemany(self._update_sql, rows)
+        metrics.count("rows_refreshed", len(rows))
+        return len(rows)
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {RESULTS_TABLE}").fetchone()[0]
+
+    def version(self):
+        with self.lock:
+            return result_set_version(self.conn)
+
+    # 🔍 Stored results for the given numbers as a text DataFrame indexed by Query (latest row per number)
+    def rows_for(self, numbers):
+        numbers = list(dict.fromkeys(numbers))
+        select = f"SELECT {', '.join(_quote(h) for h in self.headers)} FROM {RESULTS_TABLE}"
+        rows = []
+        with self.lock:
+            for start in range(0, len(numbers), LOOKUP_BATCH_SIZE):
+                batch = numbers[start:start + LOOKUP_BATCH_SIZE]
+                rows += self.conn.execute(
+                    f'{select} WHERE "Query" IN ({", ".join("?" for _ in batch)}) ORDER BY id', batch
+                ).fetchall()
+        frame = pd.DataFrame(rows, columns=self.headers)
+        return frame.drop_duplicates("Query", keep="last").set_index("Query", drop=False)
+
+    # 🕰️ REFRESHABLE rows validated before `cutoff` (epoch seconds) or at an unknown time, in refresh order
+    # Returns up to `limit` (id, normalized Query) pairs.
+    def stale_rows(self, cutoff, limit):
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT id, "Query" FROM {RESULTS_TABLE} '
+                f"WHERE ({VALIDATED_AT} IS NULL OR {VALIDATED_AT} < ?) AND {REFRESHABLE} "
+                f"ORDER BY {REFRESH_PRIORITY}, {VALIDATED_AT}, id LIMIT ?",
+                (cutoff, limit),
+            ).fetchall()
+        return [(row_id, _normalize_query(query)) for row_id, query in rows]
+
+    def stale_count(self, cutoff):
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM {RESULTS_TABLE} "
+                f"WHERE ({VALIDATED_AT} IS NULL OR {VALIDATED_AT} < ?) AND {REFRESHABLE}",
+                (cutoff,),
+            ).fetchone()[0]
+
+    # 📅 API calls spent on refreshes on one day (local date, YYYY-MM-DD)
+    def refresh_calls(self, day):
+        with self.lock:
+            row = self.conn.execute(f"SELECT api_calls FROM {REFRESH_TABLE} WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else 0
+
+    def add_refresh_calls(self, day, api_calls):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    f"INSERT INTO {REFRESH_TABLE} (day, api_calls) VALUES (?, ?) "
+                    f"ON CONFLICT(day) DO UPDATE SET api_calls = api_calls + excluded.api_calls",
+                    (day, api_calls),
+                )
+
+    # 📥 One-time migration of a workbook written by the old append_to_excel
+    # Imported rows have no lookup time, so a refresh treats them as the oldest. Rows the
+    # old scripts wrote for failed requests are left out, so those numbers are looked up again.
+    def import_excel(self, file_path):
+        df = pd.read_excel(file_path, dtype=str)
+        missing = [h for h in self.headers if h not in df.columns]
+        if missing:
+            raise ValueError(f"'{file_path}' is missing columns: {missing}")
+        if "Status" in df.columns:
+            df = df[~df["Status"].isin(LEGACY_RETRY_STATUSES)]
+        return self._insert(df, None)
+
+    # 🔄 Stored results in id order as typed DataFrames (or the stored text), `chunk_size` rows at a time
+    # Reads through its own connection (WAL allows it), so appends are not blocked meanwhile.
+    def iter_frames(self, columns=None, chunk_size=EXPORT_CHUNK_SIZE, typed=True):
+        columns = list(columns or self.headers)
+        conn = sqlite3.connect(self.path)
+        try:
+            sql = f"SELECT {', '.join(_quote(c) for c in columns)} FROM {RESULTS_TABLE} ORDER BY id"
+            for frame in pd.read_sql_query(sql, conn, chunksize=chunk_size):
+                yield to_typed_frame(frame) if typed else frame
+        finally:
+            conn.close()
+
+    # 📤 Export all stored results to .xlsx, streamed in chunks (see write_excel)
+    @metrics.timed(metrics.STAGE_EXPORT)
+    def export_to_excel(self, file_path, sheet_name="Sheet1", chunk_size=EXPORT_CHUNK_SIZE):
+        if self.count() >= EXCEL_MAX_ROWS:
+            raise ValueError(f"{self.count()} results do not fit in one .xlsx sheet, export to .csv or .parquet instead")
+        # Write to a temp file first so an interrupted export never clobbers the last good workbook
+        tmp_path = file_path + ".tmp.xlsx"
+        rows = write_excel(tmp_path, self.headers, self.iter_frames(chunk_size=chunk_size), sheet_name)
+        os.replace(tmp_path, file_path)
+        return rows
+
+    # 📤 Export all stored results to .csv (gzip-compressed for .csv.gz), streamed in chunks
+    @metrics.timed(metrics.STAGE_EXPORT)
+    def export_to_csv(self, file_path, chunk_size=EXPORT_CHUNK_SIZE):
+        rows = 0
+        tmp_path = file_path + ".tmp.csv"
+        if export_extension(file_path) == ".csv.gz":
+            tmp_path += ".gz"
+            f = gzip.open(tmp_path, "wt", compresslevel=GZIP_LEVEL, newline="", encoding="utf-8")
+        else:
+            f = open(tmp_path, "w", newline="", encoding="utf-8")
+        with f:
+            f.write(pd.DataFrame(columns=self.headers).to_csv(index=False))
+            for frame in self.iter_frames(chunk_size=chunk_size):
+                frame.to_csv(f, index=False, header=False)
+                rows += len(frame)
+        os.replace(tmp_path, file_path)
+        return rows
+
+    # 📤 Export all stored results to typed Parquet, one row group per chunk (needs pyarrow)
+    @metrics.timed(metrics.STAGE_EXPORT)
+    def export_to_parquet(self, file_path, row_group_size=EXPORT_CHUNK_SIZE):
+        schema = arrow_schema(self.headers)
+        rows = 0
+        tmp_path = file_path + ".tmp.parquet"
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for frame in self.iter_frames(chunk_size=row_group_size):
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+                rows += len(frame)
+        os.replace(tmp_path, file_path)
+        return rows
+
+    # 📤 Export by file extension (.xlsx, .csv, .csv.gz or .parquet)
+    def export(self, file_path, chunk_size=EXPORT_CHUNK_SIZE):
+        extension = export_extension(file_path)
+        if extension in (".csv", ".csv.gz"):
+            return self.export_to_csv(file_path, chunk_size=chunk_size)
+        if extension == ".parquet":
+            return self.export_to_parquet(file_path, row_group_size=chunk_size)
+        return self.export_to_excel(file_path, chunk_size=chunk_size)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# 🧵 Persistence on its own thread, fed by a bounded queue
+# put() only enqueues, so lookups never wait on disk; the writer appends in batches of
+# `flush_rows`, or whatever has arrived after `flush_seconds`. When the writer falls
+# behind and the queue fills up, put() blocks until there is room again. close()
+# drains the queue before returning, so an interrupted run still saves every result
+# it has. A failed append is re-raised on the next put() or on close().
+# `save` is what a batch is handed to (store.append by default, store.update for refreshes).
+class ResultWriter:
+    def __init__(self, store, flush_rows=WRITER_FLUSH_ROWS, flush_seconds=WRITER_FLUSH_SECONDS,
+                 max_pending=WRITER_MAX_PENDING, save=None):
+        self.store = store
+        self.save = save if save is not None else store.append
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, row):
+        self._raise_error()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            metrics.count("writer_backpressure")
+            with metrics.timed(metrics.STAGE_WRITER_WAIT):
+                self.queue.put(row)
+
+    def _run(self):
+        batch, deadline = [], None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # Interval elapsed with a partial batch
+            if item is not None and item is not _CLOSE:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_seconds
+                batch.append(item)
+                if len(batch) < self.flush_rows and time.monotonic() < deadline:
+                    continue
+            if batch:
+                self._flush(batch)
+                batch = []
+            if item is _CLOSE:
+                return
+
+    def _flush(self, batch):
+        if self.error is not None:
+            return  # Already failed: keep draining so put() never blocks forever
+        try:
+            self.written += self.save(batch)
+        except Exception as e:
+            self.error = e
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Saving results to '{self.store.path}' failed: {self.error}") from self.error
+
+    # 🏁 Write everything still queued, stop the thread
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(_CLOSE)
+            self.thread.join()
+        self._raise_error()
+
+
+# 🗂️ Open the store for an output workbook, seeding it from that workbook on first use
+# The store comes with its processed-number index attached and caught up.
+def open_result_store(output_file, headers, index=None):
+    path = store_path_for(output_file)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if index is None:
+        index = ProcessedIndex(index_prefix_for(path))
+    store = ResultStore(path, headers, index)
+    if store.count() == 0 and os.path.exists(output_file):
+        try:
+            imported = store.import_excel(output_file)
+            print(f"📥 Imported {imported} existing rows from '{output_file}' into '{store.path}'.")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not import '{output_file}': {e}")
+    sync_processed_index(store.index, path)
+    return store
+
+
+# 📤 Export a finished run: the requested file plus a typed Parquet copy when pyarrow is installed
+# Returns the paths written. Result sets too large for one .xlsx sheet go to .csv instead.
+def export_outputs(store, output_file):
+    written = []
+    try:
+        store.export(output_file)
+        written.append(output_file)
+    except ValueError as e:
+        fallback = os.path.splitext(output_file)[0] + ".csv"
+        print(f"⚠️ {e}; writing '{fallback}' instead.")
+        store.export_to_csv(fallback)
+        written.append(fallback)
+    parquet_file = os.path.splitext(output_file)[0] + ".parquet"
+    if PARQUET_AVAILABLE and parquet_file not in written:
+        store.export_to_parquet(parquet_file)
+        written.append(parquet_file)
+    return written
+
+
+# 📁 Where cached_export keeps the export of one result-set version
+def cached_export_path(version, export_dir, extension, name="results"):
+    if extension not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported export format '{extension}', expected one of {EXPORT_EXTENSIONS}")
+    return os.path.join(export_dir, f"{name}.{hashlib.sha1(version.encode()).hexdigest()[:12]}{extension}")
+
+
+# 📦 Export for downloads, cached by result-set version: <export_dir>/<name>.<version hash><extension>
+# A repeat request for unchanged results gets the existing file back without touching the
+# store; writing a new version removes the older ones. Returns the path: the web server
+# streams the file from disk, so an export is never read into memory.
+def cached_export(store, export_dir, extension, name="results"):
+    path = cached_export_path(store.version(), export_dir, extension, name)
+    with _EXPORT_LOCK:
+        if os.path.exists(path):
+            metrics.count("export_cache_hits")
+            return path
+        metrics.count("export_cache_misses")
+        os.makedirs(export_dir, exist_ok=True)
+        store.export(path, chunk_size=DOWNLOAD_CHUNK_SIZE)
+        for old in glob.glob(os.path.join(glob.escape(export_dir), f"{glob.escape(name)}.*{extension}")):
+            if old != path and export_extension(old) == extension:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass  # Still open for a download (Windows): the next export removes it
+        return path
+
+
+# 🔄 Catch an index up with rows appended to a store since it last looked
+# Only rows past index.last_id are read, so a resume or a Streamlit rerun costs
+# milliseconds when the index is current (the usual case, since appends update it).
+def sync_processed_index(index, store_path):
+    with index.lock:
+        if not os.path.exists(store_path):
+            return len(index)
+        conn = sqlite3.connect(store_path)
+        try:
+            while True:
+                rows = conn.execute(
+                    f'SELECT id, "Query", "Status" FROM {RESULTS_TABLE} WHERE id > ? ORDER BY id LIMIT ?',
+                    (index.last_id, SYNC_BATCH_SIZE),
+                ).fetchall()
+                if not rows:
+                    break
+                index.add([_normalize_query(q) for _, q, status in rows if _indexable(q, status)], rows[-1][0])
+        except sqlite3.OperationalError:
+            pass  # Store not created yet
+        finally:
+            conn.close()
+        return len(index)
@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from result_schema import FALSE_VALUES, TRUE_VALUES, to_typed_frame
+from result_store import RESULTS_TABLE, _quote, result_set_version
+
+SUMMARY_TABLE = "summaries"
+PAGE_SIZE = 100
+TOP_CARRIERS = 20
+MAX_FILTER_OPTIONS = 1000  # Most common values offered per filter; rarer ones stay reachable via other filters
+SUMMARY_MAX_AGE = 600  # Seconds a saved summary is served while a job keeps adding rows
+
+# 🔎 Filterable columns: pick-from-list values, and true/false flags
+CHOICE_FILTERS = ("Status", "Country", "Carrier")
+FLAG_FILTERS = ("Number Valid", "Is Disposable")
+
+
+def _in_list(values):
+    return "(" + ", ".join(f"'{v}'" for v in values) + ")"
+
+
+_IS_TRUE = f"lower({{column}}) IN {_in_list(TRUE_VALUES)}"
+_IS_FALSE = f"lower({{column}}) IN {_in_list(FALSE_VALUES)}"
+
+
+# 🔍 Read side of a result store for browsing: filtered pages and aggregates, all in SQL
+# Pages are cut in the database (LIMIT/OFFSET over matching ids), so only one page of
+# rows ever leaves it, whatever the store size. Aggregates are computed in one pass and
+# saved in the store with the version they describe; until rows are added or refreshed,
+# every page load reads the saved copy (and while a job is adding rows, a copy up to
+# SUMMARY_MAX_AGE old, so polling reruns do not recompute them each time). Uses its own
+# connection (WAL), so a job writing to the store meanwhile is not blocked.
+class ResultsExplorer:
+    def __init__(self, path, headers):
+        self.path = path
+        self.headers = list(headers)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} "
+            f"(name TEXT PRIMARY KEY, version TEXT NOT NULL, computed_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def version(self):
+        with self.lock:
+            return result_set_version(self.conn)
+
+    # {column: [values]} for CHOICE_FILTERS, {column: True/False} for FLAG_FILTERS
+    def _where(self, filters):
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column in CHOICE_FILTERS and value:
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' for _ in value)})")
+                params += list(value)
+            elif column in FLAG_FILTERS and value is not None:
+                clauses.append((_IS_TRUE if value else _IS_FALSE).format(column=_quote(column)))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, filters=None):
+        where, params = self._where(filters)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {RESULTS_TABLE}{where}", params).fetchone()[0]
+
+    # 📄 One page (0-based) of matching rows in store order, as a typed DataFrame
+    def page(self, filters=None, page=0, page_size=PAGE_SIZE):
+        where, params = self._where(filters)
+        columns = ", ".join(_quote(h) for h in self.headers)
+        sql = (
+            f"SELECT {columns} FROM {RESULTS_TABLE} WHERE id IN "
+            f"(SELECT id FROM {RESULTS_TABLE}{where} ORDER BY id LIMIT ? OFFSET ?) ORDER BY id"
+        )
+        with self.lock:
+            rows = self.conn.execute(sql, params + [page_size, page * page_size]).fetchall()
+        return to_typed_frame(pd.DataFrame(rows, columns=self.headers))
+
+    # 📊 Valid rate by country, top carriers and the filter options
+    # max_age=0 recomputes unless the saved copy is of the current version (e.g. right after a job).
+    def summaries(self, max_age=SUMMARY_MAX_AGE):
+        version = self.version()
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT version, computed_at, data FROM {SUMMARY_TABLE} WHERE name = 'explorer'"
+            ).fetchone()
+        if row is not None and (row[0] == version or time.time() - row[1] < max_age):
+            return json.loads(row[2])
+        data = self._compute_summaries()
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO {SUMMARY_TABLE} (name, version, computed_at, data) "
+                    f"VALUES ('explorer', ?, ?, ?)",
+                    (version, time.time(), json.dumps(data)),
+                )
+        return data
+
+    def _compute_summaries(self):
+        valid = _IS_TRUE.format(column=_quote("Number Valid"))
+        with self.lock:
+            by_country = self.conn.execute(
+                f'SELECT "Country", "Country Name", COUNT(*), SUM({valid}) FROM {RESULTS_TABLE} '
+                f'GROUP BY "Country", "Country Name" ORDER BY COUNT(*) DESC'
+            ).fetchall()
+            carriers = self.conn.execute(
+                f'SELECT "Carrier", COUNT(*), SUM({valid}) FROM {RESULTS_TABLE} '
+                f"WHERE \"Carrier\" NOT IN ('', 'N/A') GROUP BY \"Carrier\" ORDER BY COUNT(*) DESC LIMIT ?",
+                (TOP_CARRIERS,),
+            ).fetchall()
+            options = {
+                column: [value for (value,) in self.conn.execute(
+                    f"SELECT {_quote(column)} FROM {RESULTS_TABLE} WHERE {_quote(column)} IS NOT NULL "
+                    f"GROUP BY {_quote(column)} ORDER BY COUNT(*) DESC LIMIT ?",
+                    (MAX_FILTER_OPTIONS,),
+                )]
+                for column in CHOICE_FILTERS
+            }
+        return {
+            "rows": sum(count for _, _, count, _ in by_country),
+            "valid_by_country": [
+                {"Country": code, "Country Name": name, "Results": count, "Valid": valid_count,
+                 "Valid Rate": round(valid_count / count, 4)}
+                for code, name, count, valid_count in by_country
+            ],
+            "top_carriers": [
+                {"Carrier": carrier, "Results": count, "Valid": valid_count} for carrier, count, valid_count in carriers
+            ],
+            "options": options,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
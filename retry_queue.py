@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import metrics
+
+MAX_ATTEMPTS = 4            # First try plus three retries
+RETRY_BASE_DELAY = 5.0      # Seconds before the first retry, doubled for each one after
+RETRY_MAX_DELAY = 300.0
+FAILURE_THRESHOLD = 5       # Consecutive transient failures that open the circuit
+RESET_SECONDS = 60.0        # How long an open circuit pauses fetching before one trial request
+
+# HTTP statuses worth retrying; every other non-200 answer is final
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+def is_transient_status(status_code):
+    return status_code in TRANSIENT_STATUSES
+
+
+# 🔁 Deferred lookups, each due after an exponential backoff with jitter
+class RetryQueue:
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 clock=time.monotonic, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.random = rng or random.Random()
+        self.heap = []
+        self.sequence = itertools.count()  # Keeps equal due times in push order
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+    # Backoff before `attempt` (2 = first retry): base * 2^(attempt-2), capped, times 0.5–1.5
+    def delay_for(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** max(0, attempt - 2))
+        return delay * self.random.uniform(0.5, 1.5)
+
+    # ➕ Schedule `attempt` for a number; returns the delay in seconds
+    def push(self, phone_number, attempt):
+        delay = self.delay_for(attempt)
+        with self.lock:
+            heapq.heappush(self.heap, (self.clock() + delay, next(self.sequence), phone_number, attempt))
+        metrics.count("retries_scheduled")
+        return delay
+
+    # (phone_number, attempt) of the earliest retry that is due, else None
+    def pop_due(self):
+        with self.lock:
+            if self.heap and self.heap[0][0] <= self.clock():
+                _, _, phone_number, attempt = heapq.heappop(self.heap)
+                return phone_number, attempt
+        return None
+
+    def seconds_until_next(self):
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0.0, self.heap[0][0] - self.clock())
+
+
+# 🔌 Stops spending budget on a provider that is down
+# After `failure_threshold` transient failures in a row the circuit opens and try_pass()
+# turns every request away for `reset_seconds` (KeyPool.acquire waits or picks another
+# key); then one trial request goes through and either closes the circuit again or re-opens it.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_seconds=RESET_SECONDS,
+                 clock=time.monotonic, name=None):
+        self.name = name  # Shown in messages when several breakers are in use (one per API key)
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    # Seconds until a request may go out (0.0 = now), without claiming the half-open trial
+    def ready_in(self):
+        with self.lock:
+            return self._ready_in(self.clock())
+
+    # Let a request through if one may go out now (returns 0.0, claiming the trial when half-open)
+    def try_pass(self):
+        with self.lock:
+            pause = self._ready_in(self.clock())
+            if pause <= 0 and self.state == CIRCUIT_HALF_OPEN:
+                self.trial_in_flight = True
+            return pause
+
+    def _ready_in(self, now):
+        if self.state == CIRCUIT_CLOSED:
+            return 0.0
+        if self.state == CIRCUIT_OPEN and now >= self.opened_until:
+            self.state = CIRCUIT_HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == CIRCUIT_HALF_OPEN and not self.trial_in_flight:
+            return 0.0
+        return self.opened_until - now if self.state == CIRCUIT_OPEN else 0.5
+
+    def _label(self):
+        return f"[{self.name}] " if self.name else ""
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CIRCUIT_CLOSED:
+                print(f"🔌 {self._label()}Provider is answering again, circuit closed.")
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state == CIRCUIT_CLOSED:
+                    print(f"🔌 {self._label()}{self.failures} failures in a row, "
+                          f"pausing requests for {self.reset_seconds:g}s at a time.")
+                    metrics.count("circuit_opened")
+                self.state = CIRCUIT_OPEN
+                self.opened_until = self.clock() + self.reset_seconds
+                self.trial_in_flight = False
+
+    # The request ended without telling whether the provider is back (throttled, key dropped):
+    # a half-open circuit lets the next request through as the trial instead
+    def release_trial(self):
+        with self.lock:
+            self.trial_in_flight = False
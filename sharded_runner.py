@@ -0,0 +1,213 @@
+import argparse
+import collections
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import metrics
+from input_reader import PHONE_COLUMN, PhoneNumberReader
+from lookup_session import LookupSession, add_lookup_arguments
+from prevalidation import prevalidate_numbers, rejection_summary
+from result_schema import EXPECTED_HEADERS
+from result_store import ResultWriter, export_outputs, open_result_store
+
+SPLIT_WINDOW = 4       # Input chunks in flight per worker while splitting
+
+
+# 🧮 Shard of every number: a fixed hash of the normalized text, so a number always lands on the same worker
+def shard_ids(normalized, shards):
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy() % shards
+
+
+# 📂 Files of one shard, next to the output (output.xlsx → output.shard2of4.xlsx / .db / .queue.csv)
+def shard_output(output_file, shard, shards):
+    stem, extension = os.path.splitext(output_file)
+    return f"{stem}.shard{shard + 1}of{shards}{extension}"
+
+
+def shard_queue(output_file, shard, shards):
+    return os.path.splitext(shard_output(output_file, shard, shards))[0] + ".queue.csv"
+
+
+# 🧹 Pre-validate one input chunk and group its plausible numbers by shard (runs in a worker process)
+def split_chunk(chunk, shards):
+    checked = prevalidate_numbers(chunk)
+    plausible = checked.loc[checked["Reject Reason"].isna(), "Normalized"]
+    groups = {}
+    if not plausible.empty:
+        for shard, numbers in plausible.groupby(shard_ids(plausible, shards)):
+            groups[int(shard)] = numbers.tolist()
+    return rejection_summary(checked).to_dict(), groups
+
+
+# ✂️ Phase 1: stream the input once and write one queue file of pending numbers per shard
+# Normalization runs in the process pool; numbers already in the merged output are left out.
+def split_input(args, pool, final_index):
+    reader = PhoneNumberReader(args.input, sheet_name=args.sheet)
+    queues = [open(shard_queue(args.output, shard, args.workers), "w", encoding="utf-8")
+              for shard in range(args.workers)]
+    for f in queues:
+        f.write(PHONE_COLUMN + "\n")
+    dropped, queued, skipped = collections.Counter(), [0] * args.workers, 0
+    in_flight = collections.deque()
+    try:
+        chunks = reader.chunks()
+        while True:
+            for chunk in chunks:
+                in_flight.append(pool.submit(split_chunk, chunk, args.workers))
+                if len(in_flight) >= args.workers * SPLIT_WINDOW:
+                    break
+            if not in_flight:
+                break
+            # Results are taken in submission order, so queue files keep the input order
+            reasons, groups = in_flight.popleft().result()
+            dropped.update(reasons)
+            for shard, numbers in groups.items():
+                seen = final_index.contains_many(numbers)
+                fresh = [number for number, done in zip(numbers, seen) if not done]
+                skipped += len(numbers) - len(fresh)
+                if fresh:
+                    queues[shard].write("\n".join(fresh) + "\n")
+                    queued[shard] += len(fresh)
+    finally:
+        reader.close()
+        for f in queues:
+            f.close()
+    return dropped, queued, skipped
+
+
+# 🏃 Phase 2: one worker process per shard, with its own store, index and slice of the rate budget
+def run_shard(args, shard):
+    label = f"[shard {shard + 1}/{args.workers}]"
+    started = time.perf_counter()
+    store = open_result_store(shard_output(args.output, shard, args.workers), EXPECTED_HEADERS)
+    # One lookup cache file for every worker (WAL); shards never write the same number
+    session = LookupSession(args, slice_index=shard, slice_count=args.workers)
+    reader = PhoneNumberReader(shard_queue(args.output, shard, args.workers))
+
+    # Numbers a previous, interrupted run of this shard already stored are skipped
+    def pending_numbers():
+        for chunk in reader.chunks():
+            for phone_number, done in zip(chunk, store.index.contains_many(chunk)):
+                if not done:
+                    yield phone_number
+
+    writer = ResultWriter(store)
+    try:
+        for phone_number, values in session.lookup_many(pending_numbers()):
+            writer.put(values)
+    finally:
+        writer.close()
+        reader.close()
+        store.close()
+        store.index.close()
+        session.close()
+
+    return {
+        "shard": shard,
+        "label": label,
+        "stored": writer.written,
+        "failed": session.failed,
+        "api_calls": session.api_calls,
+        "seconds": time.perf_counter() - started,
+        "summary": session.summary(),
+        "metrics": metrics.REGISTRY.snapshot(reset=True),  # This process's stages, merged into the run summary
+    }
+
+
+# 🧩 Phase 3: append every shard's results to the output store, shard by shard in id order
+# The order depends only on the shard number and each shard's own append order, so the
+# merged output is the same however the workers were scheduled. Shard files are removed
+# once their rows are in.
+def merge_shards(args, store):
+    merged = 0
+    for shard in range(args.workers):
+        shard_file = shard_output(args.output, shard, args.workers)
+        shard_store = open_result_store(shard_file, EXPECTED_HEADERS)
+        for frame in shard_store.iter_frames(typed=False):
+            fresh = frame[~store.index.contains_many(frame["Query"])]
+            merged += store.append(fresh)
+        shard_store.close()
+        shard_store.index.close()
+        _remove_shard_files(args.output, shard, args.workers)
+    return merged
+
+
+def _remove_shard_files(output_file, shard, shards):
+    prefix = os.path.splitext(shard_output(output_file, shard, shards))[0]
+    for path in glob.glob(glob.escape(prefix) + ".*"):
+        os.remove(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate a large phone number file with several worker processes, "
+                    "each owning the numbers whose hash falls in its shard",
+    )
+    parser.add_argument("input", help=f".xlsx or .csv file with a {PHONE_COLUMN} column")
+    parser.add_argument("output", help="merged output (.xlsx, .csv or .parquet); its .db store is reused across runs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sheet", help="worksheet to read (default: the first one)")
+    add_lookup_arguments(parser, budget_help="budget per API key, split between the workers",
+                         max_in_flight_help="concurrent requests per worker")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"❌ Error: Input file '{args.input}' not found!")
+        return 1
+    started = time.perf_counter()
+    print(f"🚀 Validating '{args.input}' with {args.workers} workers...")
+
+    store = open_result_store(args.output, EXPECTED_HEADERS)
+    # Fresh interpreters for the workers: nothing inherited from this process (open stores, threads)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        try:
+            dropped, queued, skipped = split_input(args, pool, store.index)
+        except ValueError as e:
+            # "Phone_Number" column is missing
+            print(f"❌ Error: {e}")
+            store.close()
+            return 1
+        print(f"✂️ {sum(queued)} numbers queued over {args.workers} shards "
+              f"({', '.join(str(n) for n in queued)}), {skipped} already in '{store.path}'")
+        print(f"🧹 Pre-validation dropped {sum(dropped.values())} rows")
+        for reason, count in dropped.most_common():
+            print(f"   • {reason}: {count}")
+
+        shard_runs = [pool.submit(run_shard, args, shard) for shard in range(args.workers)]
+        reports = sorted((run.result() for run in shard_runs), key=lambda report: report["shard"])
+
+    for report in reports:
+        metrics.REGISTRY.merge(report["metrics"])
+        print(f"🧩 {report['label']} {report['stored']} stored, {report['failed']} left for the next run, "
+              f"{report['api_calls']} API calls in {report['seconds']:.1f}s")
+        print(report["summary"])
+
+    merged = merge_shards(args, store)
+    print(f"🔗 Merged {merged} results into '{store.path}'")
+
+    print(f"📤 Exporting {store.count()} results to '{args.output}'...")
+    for path in export_outputs(store, args.output):
+        print(f"   • {path}")
+    store.close()
+    store.index.close()
+
+    print(f"📡 API calls made: {sum(report['api_calls'] for report in reports)}")
+    print(metrics.REGISTRY.summary())
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import coalescing
+from coalescing import InflightRequests
+from phone_api import REQUEST_FAILED, PhoneApiClient, TransientLookupError
+from rate_limiter import TokenBucket
+from retry_queue import RetryQueue
+
+
+class FlakyClient(PhoneApiClient):
+    def __init__(self, failures, **kwargs):
+        retry_queue = RetryQueue(base_delay=0, max_delay=0)
+        super().__init__("status,query", ["Status", "Query"], TokenBucket(1000, 1, burst=10),
+                         retry_queue=retry_queue, sleep=lambda seconds: None, **kwargs)
+        self.failures = collections.Counter(failures)
+        self.calls = collections.Counter()
+
+    def lookup(self, phone_number, lane=None):
+        self.calls[phone_number] += 1
+        if self.failures[phone_number]:
+            self.failures[phone_number] -= 1
+            raise TransientLookupError(phone_number, "HTTP 503")
+        return ["success", phone_number]
+
+
+# Runs leader_fn as the leader for "+1" and a second caller while it is in flight;
+# the leader only finishes once the follower has joined its call
+def leader_and_follower(monkeypatch, leader_fn):
+    inflight = InflightRequests()
+    started, joined = threading.Event(), threading.Event()
+    monkeypatch.setattr(coalescing.metrics, "count", lambda name, *args, **kwargs: joined.set())
+    follower_calls = []
+
+    def leader():
+        started.set()
+        assert joined.wait(5)
+        return leader_fn()
+
+    def follower():
+        follower_calls.append("+1")
+        return "own answer"
+
+    with ThreadPoolExecutor(2) as pool:
+        leading = pool.submit(inflight.run, "+1", leader)
+        assert started.wait(5)
+        following = pool.submit(inflight.run, "+1", follower)
+        outcomes = [leading.exception(5) or leading.result(), following.exception(5) or following.result()]
+    assert follower_calls == []
+    assert len(inflight) == 0
+    return outcomes
+
+
+def test_follower_gets_the_leaders_result(monkeypatch):
+    assert leader_and_follower(monkeypatch, lambda: "answer") == ["answer", "answer"]
+
+
+def test_follower_gets_the_leaders_exception(monkeypatch):
+    def fail():
+        raise TransientLookupError("+1", "HTTP 503")
+
+    leader_error, follower_error = leader_and_follower(monkeypatch, fail)
+    assert isinstance(leader_error, TransientLookupError)
+    assert follower_error is leader_error
+
+
+def test_finished_calls_are_not_kept():
+    inflight = InflightRequests()
+    assert inflight.run("+1", lambda: "first") == "first"
+    with pytest.raises(ValueError):
+        inflight.run("+1", lambda: int("x"))
+    assert len(inflight) == 0
+    assert inflight.run("+1", lambda: "second") == "second"
+
+
+def test_repeats_are_looked_up_once_per_run_and_yielded_for_every_row():
+    client = FlakyClient({"+2": 1})
+    numbers = ["+1", "+2", "+3", "+1", "+2", "+4", "+2"]
+    results = [number for number, values in client.lookup_many(numbers)]
+    assert sorted(results) == sorted(numbers)
+    assert client.calls == {"+1": 1, "+2": 2, "+3": 1, "+4": 1}
+
+
+def test_repeats_share_the_final_failure():
+    client = FlakyClient({"+1": 10}, max_in_flight=4)
+    results = list(client.lookup_many(["+1", "+1", "+2", "+1"]))
+    assert [values[0] for number, values in results if number == "+1"] == [REQUEST_FAILED] * 3
+    assert client.calls["+1"] == client.retry_queue.max_attempts
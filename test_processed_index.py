@@ -0,0 +1,42 @@
+import processed_index
+from processed_index import ProcessedIndex
+
+
+def numbers(start, count):
+    return [f"+1415555{n:04d}" for n in range(start, start + count)]
+
+
+def test_merges_survive_a_reopen_and_an_interrupted_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(processed_index, "MERGE_THRESHOLD", 5)
+    prefix = str(tmp_path / "out.idx")
+    index = ProcessedIndex(prefix)
+    index.add(numbers(0, 4))
+    assert len(index.tail) == 4
+    with open(index.log_path, "rb") as f:
+        unmerged_log = f.read()
+    index.add(numbers(4, 1))
+    assert len(index.sorted) == 5 and not index.tail
+    index.close()
+
+    # A crash after the .npy was replaced but before the log was truncated
+    with open(prefix + ".log", "ab") as f:
+        f.write(unmerged_log)
+    index = ProcessedIndex(prefix)
+    assert len(index) == 5 and not index.tail
+
+    index.add(numbers(0, 7))
+    assert len(index) == 7 and len(index.tail) == 2
+    assert list(index.contains_many(numbers(0, 10))) == [True] * 7 + [False] * 3
+
+    index.add(numbers(7, 3))
+    assert len(index.sorted) == 10 and not index.tail
+    index.add(numbers(10, 1))
+    index.close()
+
+    index = ProcessedIndex(prefix)
+    try:
+        assert len(index) == 11
+        assert list(index.contains_many(numbers(0, 13) + ["not a number"])) == [True] * 11 + [False] * 3
+        assert numbers(10, 1)[0] in index
+    finally:
+        index.close()
@@ -0,0 +1,59 @@
+import time
+
+from api_stub import start_stub
+from offline_metadata import OFFLINE_STATUS
+from phone_api import LOOKUP_LIVE, LOOKUP_OFFLINE, PhoneApiClient, error_row
+from prevalidation import INVALID_FORMAT
+from rate_limiter import TokenBucket
+from result_store import open_result_store
+from result_schema import EXPECTED_HEADERS, FIELDS
+
+NUMBERS = ["+14155550100", "+447911123456"]
+
+
+def run(store, mode, base_url=None):
+    kwargs = {"base_url": base_url} if base_url else {}
+    client = PhoneApiClient(FIELDS, EXPECTED_HEADERS, TokenBucket(1000, 1, burst=10), mode=mode, **kwargs)
+    pending = [number for number, seen in zip(NUMBERS, store.index.contains_many(NUMBERS)) if not seen]
+    try:
+        store.append(values for _, values in client.lookup_many(pending))
+    finally:
+        client.close()
+    return client.api_calls
+
+
+def test_offline_answers_are_looked_up_again_live(tmp_path):
+    store = open_result_store(str(tmp_path / "out.xlsx"), EXPECTED_HEADERS)
+    server = start_stub()
+    try:
+        assert run(store, LOOKUP_OFFLINE) == 0
+        assert store.count() == 2
+        assert not store.index.contains_many(NUMBERS).any()
+
+        assert run(store, LOOKUP_LIVE, server.url) == 2
+        assert store.index.contains_many(NUMBERS).all()
+        assert store.count() == 2  # The live answers replaced the offline rows
+        assert list(store.rows_for(NUMBERS)["Carrier"]) == ["Stub Telecom"] * 2
+
+        assert run(store, LOOKUP_LIVE, server.url) == 0
+    finally:
+        server.shutdown()
+        store.close()
+        store.index.close()
+
+
+def test_only_answers_for_e164_numbers_are_refreshed(tmp_path):
+    store = open_result_store(str(tmp_path / "out.xlsx"), EXPECTED_HEADERS)
+    rows = [
+        error_row(INVALID_FORMAT, "4155550100", EXPECTED_HEADERS),
+        error_row(INVALID_FORMAT, "+12", EXPECTED_HEADERS),
+        error_row(OFFLINE_STATUS, "+14155550101", EXPECTED_HEADERS),
+        error_row("success", "+14155550102", EXPECTED_HEADERS),
+    ]
+    store._insert(rows, None)  # Unknown validation time: stale
+    try:
+        assert store.stale_count(time.time()) == 1
+        assert [number for _, number in store.stale_rows(time.time(), 10)] == ["+14155550102"]
+    finally:
+        store.close()
+        store.index.close()
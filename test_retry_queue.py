@@ -0,0 +1,57 @@
+import pytest
+
+from phone_api import PhoneApiClient, TransientLookupError
+from rate_limiter import TokenBucket
+from retry_queue import CIRCUIT_HALF_OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ThrottledResponse:
+    status_code = 429
+    headers = {}
+    content = b""
+
+
+class ThrottledSession:
+    def get(self, url, params=None, timeout=None):
+        return ThrottledResponse()
+
+    def close(self):
+        pass
+
+
+def half_open_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60, clock=clock)
+    breaker.record_failure()
+    clock.now += 60
+    return breaker
+
+
+def test_release_trial_lets_the_next_request_through():
+    clock = FakeClock()
+    breaker = half_open_breaker(clock)
+    assert breaker.try_pass() == 0.0
+    assert breaker.ready_in() > 0  # Trial claimed
+    breaker.release_trial()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.ready_in() == 0.0
+
+
+def test_throttled_trial_does_not_leave_the_circuit_stuck():
+    clock = FakeClock()
+    breaker = half_open_breaker(clock)
+    budget = TokenBucket(requests_per_window=1000, window_seconds=1, burst=10)
+    client = PhoneApiClient("status,query", ["Status", "Query"], budget, circuit_breaker=breaker)
+    client.session = ThrottledSession()
+
+    with pytest.raises(TransientLookupError):
+        client.lookup("+14155550100")
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.ready_in() == 0.0
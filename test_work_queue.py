@@ -0,0 +1,85 @@
+from processed_index import ProcessedIndex
+from work_queue import STATE_DONE, STATE_FAILED, STATE_PENDING, ProcessedView, WorkQueue
+
+NUMBERS = ["+14155550100", "+447911123456", "+4915112345678"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "work.db"), lease_seconds=60, clock=clock)
+    queue.enqueue(NUMBERS)
+    return queue
+
+
+def test_expired_lease_is_reclaimed_and_the_old_worker_loses_it(tmp_path):
+    clock = FakeClock()
+    queue = open_queue(tmp_path, clock)
+    try:
+        assert queue.claim("a", batch_size=2) == NUMBERS[:2]
+        clock.now += 59
+        assert queue.claim("b", batch_size=2) == NUMBERS[2:]  # Only the pending row, a's lease still holds
+
+        clock.now += 2
+        assert queue.claim("c", batch_size=2) == NUMBERS[:2]
+        assert queue.active_workers() == {"b": 1, "c": 2}
+
+        assert queue.complete("a", [(NUMBERS[0], ["a"])]) == []
+        assert queue.complete("c", [(NUMBERS[0], ["c"])]) == [(NUMBERS[0], ["c"])]
+        assert list(queue.iter_results()) == [[["c"]]]
+    finally:
+        queue.close()
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    clock = FakeClock()
+    queue = open_queue(tmp_path, clock)
+    try:
+        queue.claim("a", batch_size=1)
+        clock.now += 50
+        assert queue.heartbeat("a") == 1
+        clock.now += 50
+        assert queue.claim("b", batch_size=1) == NUMBERS[1:2]
+        assert queue.complete("a", [(NUMBERS[0], ["a"])]) == [(NUMBERS[0], ["a"])]
+    finally:
+        queue.close()
+
+
+def test_failed_numbers_go_back_to_pending(tmp_path):
+    clock = FakeClock()
+    queue = open_queue(tmp_path, clock)
+    try:
+        queue.claim("a", batch_size=3)
+        assert queue.fail("a", NUMBERS[:1]) == [(NUMBERS[0], None)]
+        assert queue.counts()[STATE_FAILED] == 1
+
+        assert queue.retry_failed() == 1
+        assert queue.counts()[STATE_PENDING] == 1
+        assert queue.claim("b", batch_size=3) == NUMBERS[:1]
+    finally:
+        queue.close()
+
+
+def test_processed_view_skips_numbers_done_in_the_queue(tmp_path):
+    clock = FakeClock()
+    queue = open_queue(tmp_path, clock)
+    index = ProcessedIndex(str(tmp_path / "index"))
+    try:
+        index.add(NUMBERS[:1])
+        queue.claim("a", batch_size=3)
+        queue.complete("a", [(NUMBERS[1], ["a"])])
+        assert queue.counts()[STATE_DONE] == 1
+
+        view = ProcessedView(index, queue)
+        assert list(view.contains_many(NUMBERS)) == [True, True, False]
+        assert NUMBERS[1] in view and NUMBERS[2] not in view
+        assert list(ProcessedView(index).contains_many(NUMBERS)) == [True, False, False]
+    finally:
+        index.close()
+        queue.close()
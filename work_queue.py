@@ -0,0 +1,456 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from input_reader import PHONE_COLUMN, PhoneNumberReader
+from lookup_cache import cache_key
+from lookup_session import LookupSession, add_lookup_arguments
+from phone_api import UNFINISHED_STATUSES
+from prevalidation import prevalidate_numbers
+from result_schema import EXPECTED_HEADERS
+from result_store import LOOKUP_BATCH_SIZE, export_outputs, open_result_store, processed_rows
+
+# 🚦 Row states
+STATE_PENDING = "pending"
+STATE_LEASED = "leased"
+STATE_DONE = "done"
+STATE_FAILED = "failed"  # Out of retries this run; the next enqueue puts it back to pending
+STATES = (STATE_PENDING, STATE_LEASED, STATE_DONE, STATE_FAILED)
+
+WORK_QUEUE_ENV = "PHONE_WORK_QUEUE"  # Queue whose done numbers the incremental script and the GUI skip too
+
+LEASE_SECONDS = 120   # A claimed batch is reclaimable this long after the last heartbeat
+BATCH_SIZE = 50       # Numbers per claim
+EXPORT_BATCH_SIZE = 10_000
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# 📋 Shared work queue of normalized numbers, with leases
+# Workers claim batches; a claim is a lease that the worker's heartbeat keeps extending.
+# When a worker dies its heartbeat stops, the lease runs out and the next claim hands
+# the rows to someone else. Results are written back into the queue, so it is the one
+# record of what is done: seed_done() marks what an output store already holds, claims
+# never return done rows, export appends done rows the output does not have yet, and the
+# incremental script and the GUI resume through a ProcessedView over it (PHONE_WORK_QUEUE).
+# Workers do not coordinate their request rate: each takes 1/--workers of every key's budget.
+# This backend is one SQLite file: fine for several processes on one machine. Boxes
+# that share a job need the same interface over a server database.
+class WorkQueue:
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, clock=time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Autocommit; claims open their own write transaction (BEGIN IMMEDIATE)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS work ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, number TEXT NOT NULL UNIQUE,"
+            " state TEXT NOT NULL, worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_state ON work (state, seq)")
+
+    # ➕ Add numbers (input order is claim order); numbers already queued are left as they are
+    def enqueue(self, numbers):
+        now = self.clock()
+        with self.lock:
+            before = self.conn.total_changes
+            self._write(
+                "INSERT OR IGNORE INTO work (number, state, updated_at) VALUES (?, ?, ?)",
+                [(cache_key(number), STATE_PENDING, now) for number in numbers],
+            )
+            return self.conn.total_changes - before
+
+    # ✅ Mark numbers done without a result (e.g. rows an output store already holds)
+    def seed_done(self, numbers):
+        now = self.clock()
+        with self.lock:
+            before = self.conn.total_changes
+            self._write(
+                "INSERT INTO work (number, state, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (number) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at "
+                f"WHERE work.state IN ('{STATE_PENDING}', '{STATE_FAILED}')",
+                [(key, STATE_DONE, now) for key in map(cache_key, numbers) if key],
+            )
+            return self.conn.total_changes - before
+
+    # 🔁 Give numbers that ran out of retries in an earlier run another go
+    def retry_failed(self):
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE work SET state = ?, worker = NULL, updated_at = ? WHERE state = ?",
+                (STATE_PENDING, self.clock(), STATE_FAILED),
+            )
+            return cursor.rowcount
+
+    def _write(self, sql, rows):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(sql, rows)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # 🎟️ Lease up to `batch_size` numbers: expired leases first (a crashed worker's rows), then pending ones
+    def claim(self, worker_id, batch_size=BATCH_SIZE):
+        now = self.clock()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self.conn.execute(
+                    "SELECT seq, number FROM work WHERE state = ? AND lease_until < ? ORDER BY seq LIMIT ?",
+                    (STATE_LEASED, now, batch_size),
+                ).fetchall()
+                fresh = self.conn.execute(
+                    "SELECT seq, number FROM work WHERE state = ? ORDER BY seq LIMIT ?",
+                    (STATE_PENDING, batch_size - len(expired)),
+                ).fetchall() if len(expired) < batch_size else []
+                rows = expired + fresh
+                self.conn.executemany(
+                    "UPDATE work SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE seq = ?",
+                    [(STATE_LEASED, worker_id, now + self.lease_seconds, now, seq) for seq, _ in rows],
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if expired:
+            metrics.count("leases_reclaimed", len(expired))
+        metrics.count("leases_claimed", len(rows))
+        return [number for _, number in rows]
+
+    # 💓 Push back the lease of everything the worker holds; returns how many rows that was
+    def heartbeat(self, worker_id):
+        now = self.clock()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE work SET lease_until = ? WHERE worker = ? AND state = ?",
+                (now + self.lease_seconds, worker_id, STATE_LEASED),
+            )
+            return cursor.rowcount
+
+    def start_heartbeat(self, worker_id, interval=None):
+        return Heartbeat(self, worker_id, interval or self.lease_seconds / 3)
+
+    # ✅ Store results for leased numbers; returns the (number, values) pairs accepted
+    # A number whose lease ran out and went to another worker is not accepted, so the
+    # results of the two workers never both count.
+    def complete(self, worker_id, results):
+        return self._finish(worker_id, results, STATE_DONE)
+
+    # ⚠️ Out of retries: park the numbers as failed (retried by the next enqueue)
+    def fail(self, worker_id, numbers):
+        return self._finish(worker_id, [(number, None) for number in numbers], STATE_FAILED)
+
+    def _finish(self, worker_id, results, state):
+        now = self.clock()
+        accepted = []
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for number, values in results:
+                    cursor = self.conn.execute(
+                        "UPDATE work SET state = ?, result = ?, lease_until = NULL, updated_at = ? "
+                        "WHERE number = ? AND worker = ? AND state = ?",
+                        (state, json.dumps(values) if values is not None else None, now,
+                         cache_key(number), worker_id, STATE_LEASED),
+                    )
+                    if cursor.rowcount:
+                        accepted.append((number, values))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if len(accepted) < len(results):
+            metrics.count("leases_lost", len(results) - len(accepted))
+        return accepted
+
+    # ↩️ Hand back everything the worker still holds (clean shutdown)
+    def release(self, worker_id):
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE work SET state = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE worker = ? AND state = ?",
+                (STATE_PENDING, self.clock(), worker_id, STATE_LEASED),
+            )
+            return cursor.rowcount
+
+    # ⏳ Seconds until some other worker's lease could run out (None when nothing is leased)
+    def seconds_until_reclaimable(self):
+        with self.lock:
+            lease_until = self.conn.execute(
+                "SELECT MIN(lease_until) FROM work WHERE state = ?", (STATE_LEASED,)
+            ).fetchone()[0]
+        if lease_until is None:
+            return None
+        return max(0.0, lease_until - self.clock())
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM work GROUP BY state").fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    # 👷 Workers holding live leases: {worker: rows held}
+    def active_workers(self):
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT worker, COUNT(*) FROM work WHERE state = ? AND lease_until >= ? GROUP BY worker",
+                (STATE_LEASED, self.clock()),
+            ).fetchall())
+
+    # ✅ Which of the numbers are done, as a bool array in input order
+    def done_many(self, numbers):
+        keys = [cache_key(number) for number in numbers]
+        done = set()
+        with self.lock:
+            for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                done.update(number for (number,) in self.conn.execute(
+                    f"SELECT number FROM work WHERE state = ? AND number IN ({', '.join('?' for _ in batch)})",
+                    [STATE_DONE, *batch],
+                ))
+        return np.array([key in done for key in keys], dtype=bool)
+
+    # 🔄 Stored results of done numbers in queue order, `batch_size` rows at a time
+    def iter_results(self, batch_size=EXPORT_BATCH_SIZE):
+        last_seq = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT seq, result FROM work WHERE state = ? AND result IS NOT NULL AND seq > ? "
+                    "ORDER BY seq LIMIT ?",
+                    (STATE_DONE, last_seq, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            yield [json.loads(result) for _, result in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# 👁️ Resume check of the incremental script and the GUI: their own index, plus a queue's done rows
+# Reads like a ProcessedIndex (contains_many, `in`, len), so a number any queue worker finished
+# is skipped even before it is exported to the output. Without a queue it is the index alone.
+# close() closes the queue only; the index belongs to its store.
+class ProcessedView:
+    def __init__(self, index, queue=None):
+        self.index = index
+        self.queue = queue
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, phone_number):
+        return bool(self.contains_many([phone_number])[0])
+
+    def contains_many(self, phone_numbers):
+        phone_numbers = list(phone_numbers)
+        found = self.index.contains_many(phone_numbers)
+        if self.queue is not None and len(phone_numbers):
+            found |= self.queue.done_many(phone_numbers)
+        return found
+
+    def close(self):
+        if self.queue is not None:
+            self.queue.close()
+
+
+# 🔗 ProcessedView over the queue named by PHONE_WORK_QUEUE (if any) and a script's index
+def open_processed_view(index, environ=os.environ):
+    path = environ.get(WORK_QUEUE_ENV)
+    if not path:
+        return ProcessedView(index)
+    if not os.path.exists(path):
+        print(f"⚠️ Warning: Work queue '{path}' not found, resuming from the output only.")
+        return ProcessedView(index)
+    queue = WorkQueue(path)
+    print(f"📋 Also skipping the {queue.counts()[STATE_DONE]} numbers done in work queue '{path}'")
+    return ProcessedView(index, queue)
+
+
+# 💓 Daemon thread that keeps a worker's leases alive until stopped
+class Heartbeat:
+    def __init__(self, queue, worker_id, interval):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.worker_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ Heartbeat failed ({type(e).__name__}), retrying in {self.interval:g}s")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+# 📥 enqueue: mark what the output store already holds as done, then queue the input's plausible numbers
+def enqueue_input(args):
+    queue = WorkQueue(args.queue)
+    if args.output:
+        store = open_result_store(args.output, EXPECTED_HEADERS)
+        seeded = sum(queue.seed_done(processed_rows(frame)["Query"])
+                     for frame in store.iter_frames(columns=["Query", "Status"], typed=False))
+        print(f"✅ {seeded} numbers already in '{store.path}' marked done")
+        store.close()
+        store.index.close()
+    retried = queue.retry_failed()
+    if retried:
+        print(f"🔁 {retried} numbers that ran out of retries last time are pending again")
+
+    reader = PhoneNumberReader(args.input, sheet_name=args.sheet)
+    added = 0
+    for chunk in reader.chunks():
+        checked = prevalidate_numbers(chunk)
+        added += queue.enqueue(checked.loc[checked["Reject Reason"].isna(), "Normalized"])
+    reader.close()
+    print(f"📋 {added} new numbers queued")
+    print_status(queue)
+    queue.close()
+
+
+# 🏃 work: claim, look up and complete batches until nothing is left to claim or reclaim
+def run_worker(args):
+    queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+    worker_id = args.worker_id or default_worker_id()
+    session = LookupSession(args, budget_share=1 / args.workers)
+    heartbeat = queue.start_heartbeat(worker_id)
+    print(f"👷 Worker '{worker_id}' on '{args.queue}' ({session.key_pool.describe()})")
+    completed = failed = lost = 0
+    try:
+        while True:
+            batch = queue.claim(worker_id, args.batch_size)
+            if not batch:
+                # Other workers still hold leases: wait in case one of them dies and its rows come back
+                wait = queue.seconds_until_reclaimable()
+                if wait is None:
+                    break
+                time.sleep(min(wait, args.lease_seconds) + 1)
+                continue
+
+            results, failures = [], []
+            for phone_number, values in session.api_client.lookup_many(batch):
+                if values[0] in UNFINISHED_STATUSES:
+                    failures.append(phone_number)
+                else:
+                    results.append((phone_number, values))
+            accepted = queue.complete(worker_id, results)
+            parked = queue.fail(worker_id, failures)
+            completed += len(accepted)
+            failed += len(parked)
+            lost += len(results) + len(failures) - len(accepted) - len(parked)
+            print(f"💾 {completed} done, {failed} failed, {lost} lost to other workers")
+    except KeyboardInterrupt:
+        print("✋ Interrupted, handing unfinished numbers back to the queue")
+    finally:
+        heartbeat.stop()
+        queue.release(worker_id)
+        session.close()
+
+    print(f"📡 API calls made: {session.api_calls}")
+    print(session.summary())
+    print_status(queue)
+    queue.close()
+
+
+# 📤 export: append done results the output store does not have yet, then write the usual files
+def export_queue(args):
+    queue = WorkQueue(args.queue)
+    store = open_result_store(args.output, EXPECTED_HEADERS)
+    appended = 0
+    for rows in queue.iter_results():
+        frame = pd.DataFrame(rows, columns=EXPECTED_HEADERS)
+        appended += store.append(frame[~store.index.contains_many(frame["Query"])])
+    print(f"🔗 {appended} new results appended to '{store.path}'")
+    print(f"📤 Exporting {store.count()} results to '{args.output}'...")
+    for path in export_outputs(store, args.output):
+        print(f"   • {path}")
+    store.close()
+    store.index.close()
+    queue.close()
+
+
+def print_status(queue):
+    counts = queue.counts()
+    print("📊 Queue: " + ", ".join(f"{counts[state]} {state}" for state in STATES))
+    for worker, held in sorted(queue.active_workers().items()):
+        print(f"   • {worker}: {held} leased")
+
+
+def show_status(args):
+    queue = WorkQueue(args.queue)
+    print_status(queue)
+    queue.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Shared, lease-based work queue for validating one big job "
+                                                 "with several worker processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="queue the plausible numbers of an input file")
+    enqueue.add_argument("queue", help="queue database (.db)")
+    enqueue.add_argument("input", help=f".xlsx or .csv file with a {PHONE_COLUMN} column")
+    enqueue.add_argument("--sheet", help="worksheet to read (default: the first one)")
+    enqueue.add_argument("--output", help="existing output whose results count as done")
+    enqueue.set_defaults(run=enqueue_input)
+
+    work = commands.add_parser("work", help="claim and validate batches until the queue is drained")
+    work.add_argument("queue")
+    work.add_argument("--worker-id", help="default: hostname-pid")
+    work.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    work.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    add_lookup_arguments(work)
+    work.add_argument("--workers", type=int, default=1,
+                      help="worker processes sharing the API keys; each one spends 1/N of every key's budget")
+    work.set_defaults(run=run_worker)
+
+    status = commands.add_parser("status", help="show how much of the job is done")
+    status.add_argument("queue")
+    status.set_defaults(run=show_status)
+
+    export = commands.add_parser("export", help="write the done results to an output file")
+    export.add_argument("queue")
+    export.add_argument("output", help="output (.xlsx, .csv or .parquet); its .db store is appended to")
+    export.set_defaults(run=export_queue)
+    args = parser.parse_args(argv)
+    if args.command == "work" and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())